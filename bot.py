@@ -1,6 +1,7 @@
 import asyncio
 from aiogram import Bot
 from aiogram import Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
 from config.configurations import load_config
 
 from aiogram.fsm.storage.memory import MemoryStorage
@@ -9,9 +10,22 @@ from handlers.content_callbacks import router as content_router
 from handlers.activity_timer import activity_timer
 from handlers.interactive import interactive_router
 from llm.worker import llm_worker
+from database.db_manager import init_db
 
 import logging
 
+try:
+    # uvloop (на Linux/macOS) заметно быстрее стандартного цикла событий asyncio
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    # orjson сериализует запросы к Telegram API (в т.ч. клавиатуры) в разы быстрее json
+    import orjson
+except ImportError:
+    orjson = None
+
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -20,14 +34,40 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _orjson_dumps(value) -> str:
+    """
+    json_dumps для сессии aiogram на orjson (aiogram ожидает str, orjson отдаёт bytes)
+
+    Args:
+        value: данные запроса
+
+    Returns:
+        str: JSON-строка
+    """
+    return orjson.dumps(value).decode()
+
+
+def create_session() -> AiohttpSession:
+    """
+    создаёт HTTP-сессию бота (с orjson, если он установлен)
+
+    Returns:
+        AiohttpSession: сессия для Bot
+    """
+    if orjson is None:
+        return AiohttpSession()
+    return AiohttpSession(json_loads=orjson.loads, json_dumps=_orjson_dumps)
+
+
 async def main():
     config = load_config()
 
-    bot: Bot = Bot(token=config.tg_bot.token)
+    bot: Bot = Bot(token=config.tg_bot.token, session=create_session())
     dp: Dispatcher = Dispatcher(storage=MemoryStorage())
 
     dp.include_routers(main_router, interactive_router, content_router)
 
+    db_manager = await init_db(config)
     llm_worker.start()
 
     await bot.delete_webhook(drop_pending_updates=True)
@@ -38,8 +78,12 @@ async def main():
     finally:
         logger.info("остановка бота...")
         llm_worker.stop()
+        await db_manager.close()
         logger.info("бот остановлен")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
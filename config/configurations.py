@@ -8,11 +8,13 @@ import os
 import logging
 from dataclasses import dataclass
 from dotenv import load_dotenv
-import torch
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# результат определения устройства для LLM (torch.cuda.is_available() инициализирует
+# CUDA и занимает сотни мс, поэтому проверяем один раз за процесс)
+_DEVICE: str | None = None
+
 
 class ConfigError(Exception):
     """
@@ -58,6 +60,14 @@ class LLM:
         num_retries: колво попыток при ошибке
         error_message: сообщ при ошибке LLM
         timeout_message: сообщ при таймауте
+        semantic_cache_model: модель эмбеддингов для семантического кэша
+            (пустая строка - кэш выключен)
+        semantic_cache_threshold: мин. косинусная близость для попадания в кэш
+        quantization: квантизация весов на GPU: nf4, int8 или пустая строка (fp16)
+        compile: компилировать ли forward модели через torch.compile
+        backend: движок инференса: transformers или vllm
+        batch_size: сколько ожидающих запросов генерируются одним вызовом модели
+        sample: сэмплирование при генерации (False - жадное декодирование)
     """
 
     model_name: str
@@ -70,6 +80,13 @@ class LLM:
     num_retries: int
     error_message: str
     timeout_message: str
+    semantic_cache_model: str
+    semantic_cache_threshold: float
+    quantization: str
+    compile: bool
+    backend: str
+    batch_size: int
+    sample: bool
 
 
 @dataclass
@@ -86,6 +103,28 @@ class Config:
     llm: LLM
 
 
+def _resolve_device() -> str:
+    """
+    Определяет устройство для инференса LLM: LLM_DEVICE из .env,
+    иначе cuda:0 при наличии GPU, иначе cpu
+
+    Returns:
+        str: устройство для инференса
+    """
+    global _DEVICE
+    if _DEVICE is None:
+        env_device = os.getenv("LLM_DEVICE")
+        if env_device:
+            _DEVICE = env_device
+        else:
+            # torch импортируем только здесь: если устройство задано в .env,
+            # конфигурация загружается без тяжёлого импорта torch
+            import torch
+
+            _DEVICE = "cuda:0" if torch.cuda.is_available() else "cpu"
+    return _DEVICE
+
+
 @lru_cache(maxsize=1)
 def load_config() -> Config:
     """
@@ -100,9 +139,7 @@ def load_config() -> Config:
     if load_dotenv():
         logger.info("загружаем конфигурацию из .env файла")
     try:
-        device = "cuda:0" if torch.cuda.is_available() else "cpu"
-        if os.getenv("LLM_DEVICE"):
-            device = os.getenv("LLM_DEVICE")
+        device = _resolve_device()
 
         config: Config = Config(
             tg_bot=TgBot(
@@ -128,6 +165,15 @@ def load_config() -> Config:
                     "LLM_TIMEOUT_MESSAGE",
                     "Извини, запрос занял слишком много времени. Пожалуйста, попробуй позже или задай более простой вопрос.",
                 ),
+                semantic_cache_model=os.getenv("LLM_SEMANTIC_CACHE_MODEL", ""),
+                semantic_cache_threshold=float(
+                    os.getenv("LLM_SEMANTIC_CACHE_THRESHOLD", "0.92")
+                ),
+                quantization=os.getenv("LLM_QUANTIZATION", "").lower(),
+                compile=os.getenv("LLM_COMPILE", "").lower() in ("1", "true", "yes"),
+                backend=os.getenv("LLM_BACKEND", "transformers").lower(),
+                batch_size=max(1, int(os.getenv("LLM_BATCH_SIZE", "1"))),
+                sample=os.getenv("LLM_SAMPLE", "1").lower() in ("1", "true", "yes"),
             ),
         )
         logger.info("конфигурация загружена успешно")
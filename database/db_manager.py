@@ -3,10 +3,54 @@
 Предоставляет классы и функции для работы с темами, контентом и навигацией
 """
 
-import sqlite3
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
+import aiosqlite
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from config.configurations import Config, load_config
+from config.configurations import Config
+
+# пустая клавиатура для ответов "не найдено": модели aiogram неизменяемые (frozen),
+# поэтому один объект безопасно переиспользовать между вызовами и пользователями
+EMPTY_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[])
+
+# кнопки листания теории: тема с такими кнопками - это слайд лекции
+THEORY_NAV_BUTTONS = frozenset({"➡️ Далее", "⬅️ Назад"})
+
+# SQL-запросы вынесены в константы модуля: один и тот же объект строки на каждый вызов
+# гарантирует попадание в кэш подготовленных выражений sqlite3 (cached_statements)
+_SQL_ALL_IDENTIFIERS = "SELECT identifier FROM topics"
+_SQL_TOPIC_ID = "SELECT id FROM topics WHERE identifier = ?"
+_SQL_TOPIC_CONTENT = """SELECT t.id, c.text, c.image_path, c.video_path,
+                               n.button_text, t2.identifier
+                        FROM topics t
+                        LEFT JOIN content c ON c.topic_id = t.id
+                        LEFT JOIN navigation n ON n.topic_id = t.id
+                        LEFT JOIN topics t2 ON n.target_topic_id = t2.id
+                        WHERE t.identifier = ? OR t.id = ?
+                        ORDER BY n.order_num"""
+_SQL_MEDIA = "SELECT image_path, video_path FROM content WHERE topic_id = ?"
+_SQL_NAVIGATION = """SELECT n.button_text, t.identifier
+                     FROM navigation n
+                     JOIN topics t ON n.target_topic_id = t.id
+                     WHERE n.topic_id = ?
+                     ORDER BY n.order_num"""
+_SQL_INSERT_TOPIC = "INSERT INTO topics (title, identifier, parent_id) VALUES (?, ?, ?)"
+_SQL_INSERT_CONTENT = (
+    "INSERT INTO content (topic_id, text, image_path, video_path) VALUES (?, ?, ?, ?)"
+)
+_SQL_INSERT_NAVIGATION = """INSERT INTO navigation
+                            (topic_id, button_text, target_topic_id, order_num)
+                            VALUES (?, ?, ?, ?)"""
+_SQL_FILE_IDS = "SELECT path, mtime, file_id FROM media_files"
+_SQL_SAVE_FILE_ID = (
+    "INSERT OR REPLACE INTO media_files (path, mtime, file_id) VALUES (?, ?, ?)"
+)
+_SQL_DELETE_FILE_ID = "DELETE FROM media_files WHERE path = ?"
+
+# размер кэша подготовленных выражений на соединение (по умолчанию в sqlite3 - 128)
+_STATEMENT_CACHE_SIZE = 256
 
 
 @dataclass
@@ -43,6 +87,58 @@ class Topic:
     parent_id: int | None = None
 
 
+class _ConnectionPool:
+    """
+    Пул соединений aiosqlite только для чтения: в режиме WAL читатели не блокируют
+    друг друга и запись, а у каждого соединения свой поток и свои курсоры,
+    так что параллельные запросы из разных хэндлеров не перемешиваются
+    """
+
+    def __init__(self, path: str, size: int):
+        """
+        Args:
+            path: путь к файлу базы данных
+            size: количество соединений в пуле
+        """
+        self._path = path
+        self._size = size
+        self._conns: list[aiosqlite.Connection] = []
+        self._idle: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+
+    async def open(self):
+        """Открывает соединения пула"""
+        for _ in range(self._size):
+            conn = await aiosqlite.connect(
+                self._path, cached_statements=_STATEMENT_CACHE_SIZE
+            )
+            await conn.executescript(
+                """
+                PRAGMA query_only=ON;
+                PRAGMA temp_store=MEMORY;
+                PRAGMA mmap_size=134217728;
+                PRAGMA busy_timeout=5000;
+            """
+            )
+            self._conns.append(conn)
+            self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Берёт свободное соединение из пула (и возвращает его обратно после использования)"""
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        """Закрывает все соединения пула"""
+        for conn in self._conns:
+            await conn.close()
+        self._conns.clear()
+        self._idle = asyncio.Queue()
+
+
 class DatabaseManager:
     """
     Данный класс является менеджером БД для управления контентом бота,
@@ -57,13 +153,60 @@ class DatabaseManager:
             config: конфигурация приложения
         """
         self.config = config
-        self.conn = sqlite3.connect(config.tg_bot.db_path)
-        self.cursor = self.conn.cursor()
-        self._init_db()
-
-    def _init_db(self):
+        # self.conn - единственное соединение для записи (BEGIN/commit сериализуются на нём),
+        # чтение идёт через пул
+        self.conn: aiosqlite.Connection | None = None
+        self._pool: _ConnectionPool | None = None
+        # контент бота меняется только через add_*, поэтому результаты чтения
+        # кэшируются на экземпляре и сбрасываются при любой записи
+        self._id_cache: dict[str, int] = {}
+        self._content_cache: dict[int, tuple[str, InlineKeyboardMarkup]] = {}
+        self._buttons_cache: dict[int, list[tuple[str, str]]] = {}
+        self._media_cache: dict[int, tuple[str | None, str | None]] = {}
+        self._theory_cache: dict[int, bool] = {}
+        # file_id медиафайлов, уже загруженных в Telegram: путь -> (mtime файла, file_id)
+        self._file_ids: dict[str, tuple[float, str]] = {}
+        # увеличивается при каждом сбросе кэша: по нему внешние кэши
+        # (например, собранные меню в MenuLoader) понимают, что данные устарели
+        self.cache_version = 0
+
+    async def connect(self):
+        """
+        Открывает соединение с БД и инициализирует её структуру
+        (вызывается один раз из bot.main, до начала polling)
+        """
+        if self.conn is not None:
+            return
+        self.conn = await aiosqlite.connect(
+            self.config.tg_bot.db_path, cached_statements=_STATEMENT_CACHE_SIZE
+        )
+        await self._init_db()
+        # соединения для чтения открываем после _init_db: WAL и таблицы уже созданы
+        self._pool = _ConnectionPool(
+            self.config.tg_bot.db_path, size=min(max(2, os.cpu_count() or 1), 4)
+        )
+        await self._pool.open()
+        await self._warm_cache()
+        self._file_ids = {
+            path: (mtime, file_id)
+            for path, mtime, file_id in await self._fetchall(_SQL_FILE_IDS)
+        }
+
+    async def _init_db(self):
         """В этом методе происходит инициализация структуры базы данных"""
-        self.cursor.executescript(
+        # WAL + synchronous=NORMAL: читатели не блокируются записью,
+        # а коммит не делает fsync на каждую вставку (journal_mode хранится в файле БД)
+        await self.conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA mmap_size=134217728;
+            PRAGMA cache_size=-65536;
+            PRAGMA busy_timeout=5000;
+        """
+        )
+        await self.conn.executescript(
             """
             -- Таблица тем (разделов)
             CREATE TABLE IF NOT EXISTS topics (
@@ -94,24 +237,111 @@ class DatabaseManager:
                 FOREIGN KEY (topic_id) REFERENCES topics(id),
                 FOREIGN KEY (target_topic_id) REFERENCES topics(id)
             );
+
+            -- кнопки всегда выбираются по теме в порядке order_num
+            CREATE INDEX IF NOT EXISTS nav_topic_order
+                ON navigation(topic_id, order_num);
+
+            -- file_id медиафайлов, загруженных в Telegram (повторно файл не загружается)
+            CREATE TABLE IF NOT EXISTS media_files (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                file_id TEXT NOT NULL
+            );
         """
         )
-        self.conn.commit()
+        await self.conn.commit()
+
+    async def _warm_cache(self):
+        """Прогрев кэша: один раз читаем контент всех тем при старте"""
+        rows = await self._fetchall(_SQL_ALL_IDENTIFIERS)
+        identifiers = [row[0] for row in rows]
+        for identifier in identifiers:
+            await self.get_topic_content(identifier)
+
+    async def _fetchone(self, sql: str, params: tuple = ()) -> tuple | None:
+        """Выполняет читающий запрос на соединении из пула и возвращает первую строку"""
+        rows = await self._fetchall(sql, params)
+        return rows[0] if rows else None
+
+    async def _fetchall(self, sql: str, params: tuple = ()) -> list[tuple]:
+        """Выполняет читающий запрос на соединении из пула и возвращает все строки"""
+        # execute_fetchall выполняет запрос и выборку за один переход в поток соединения,
+        # без создания прокси-курсора (execute + fetch + close - это три перехода)
+        async with self._pool.acquire() as conn:
+            return list(await conn.execute_fetchall(sql, params))
+
+    def _invalidate_cache(self):
+        """Сброс кэша чтения (вызывается после любой записи в БД)"""
+        self._id_cache.clear()
+        self._content_cache.clear()
+        self._buttons_cache.clear()
+        self._media_cache.clear()
+        self._theory_cache.clear()
+        self.cache_version += 1
+
+    def invalidate(self, topic_identifier: int | str):
+        """
+        Сброс закэшированного контента и клавиатуры одной темы
+        (например, после ручного редактирования контента в БД)
 
-    def add_topic(
+        Args:
+            topic_identifier: ID темы или её строковый идентификатор
+        """
+        if isinstance(topic_identifier, str):
+            topic_id = self._id_cache.pop(topic_identifier, None)
+            if topic_id is None:
+                # ID темы неизвестен, а кэши контента хранятся по ID - сбрасываем всё
+                self._invalidate_cache()
+                return
+        else:
+            topic_id = topic_identifier
+        self._content_cache.pop(topic_id, None)
+        self._buttons_cache.pop(topic_id, None)
+        self._media_cache.pop(topic_id, None)
+        self._theory_cache.pop(topic_id, None)
+        self.cache_version += 1
+
+    @asynccontextmanager
+    async def bulk(self):
+        """
+        Контекст для пакетной загрузки контента: все add_* внутри него
+        выполняются в одной транзакции с одним коммитом в конце
+        (вместо коммита на каждую строку). При ошибке транзакция откатывается.
+
+        Пример:
+            async with db_manager.bulk():
+                topic_id = await db_manager.add_topic("Матрицы")
+                await db_manager.add_content(topic_id, "...")
+        """
+        await self.conn.execute("BEGIN")
+        try:
+            yield self
+            await self.conn.commit()
+        except BaseException:
+            await self.conn.rollback()
+            self._invalidate_cache()
+            raise
+        # чтения идут через пул соединений и не видят открытую транзакцию:
+        # прочитанное во время загрузки могло попасть в кэш без новых строк
+        self._invalidate_cache()
+
+    async def add_topic(
         self, title: str, identifier: str | None = None, parent_id: int | None = None
     ) -> int:
         """в этом методе"""
         if identifier is None:
             identifier = title.lower().replace(" ", "_")
-        self.cursor.execute(
-            "INSERT INTO topics (title, identifier, parent_id) VALUES (?, ?, ?)",
-            (title, identifier, parent_id),
+        autocommit = not self.conn.in_transaction
+        (row_id,) = await self.conn.execute_insert(
+            _SQL_INSERT_TOPIC, (title, identifier, parent_id)
         )
-        self.conn.commit()
-        return self.cursor.lastrowid
+        if autocommit:
+            await self.conn.commit()
+        self._invalidate_cache()
+        return row_id
 
-    def add_content(
+    async def add_content(
         self,
         topic_id: int,
         text: str,
@@ -124,63 +354,93 @@ class DatabaseManager:
         if video_path:
             video_path = f"{self.config.tg_bot.videos_path}/{video_path}"
 
-        self.cursor.execute(
-            "INSERT INTO content (topic_id, text, image_path, video_path) VALUES (?, ?, ?, ?)",
-            (topic_id, text, image_path, video_path),
+        autocommit = not self.conn.in_transaction
+        (row_id,) = await self.conn.execute_insert(
+            _SQL_INSERT_CONTENT, (topic_id, text, image_path, video_path)
         )
-        self.conn.commit()
-        return self.cursor.lastrowid
+        if autocommit:
+            await self.conn.commit()
+        self._invalidate_cache()
+        return row_id
 
-    def add_navigation(
+    async def add_navigation(
         self, topic_id: int, button_text: str, target_topic_id: int, order_num: int
     ) -> int:
         """Метод для добавления кнопки навигации"""
-        self.cursor.execute(
-            """INSERT INTO navigation
-               (topic_id, button_text, target_topic_id, order_num)
-               VALUES (?, ?, ?, ?)""",
+        autocommit = not self.conn.in_transaction
+        (row_id,) = await self.conn.execute_insert(
+            _SQL_INSERT_NAVIGATION,
             (topic_id, button_text, target_topic_id, order_num),
         )
-        self.conn.commit()
-        return self.cursor.lastrowid
+        if autocommit:
+            await self.conn.commit()
+        self._invalidate_cache()
+        return row_id
 
-    def get_topic_id(self, identifier: str) -> int | None:
+    async def add_navigation_many(self, rows: list[tuple[int, str, int, int]]) -> None:
+        """
+        Метод для добавления нескольких кнопок навигации одним executemany
+
+        Args:
+            rows: список кортежей (topic_id, button_text, target_topic_id, order_num)
+        """
+        autocommit = not self.conn.in_transaction
+        await self.conn.executemany(_SQL_INSERT_NAVIGATION, rows)
+        if autocommit:
+            await self.conn.commit()
+        self._invalidate_cache()
+
+    async def get_topic_id(self, identifier: str) -> int | None:
         """Метод для получения ID темы по её идентификатору"""
-        self.cursor.execute("SELECT id FROM topics WHERE identifier = ?", (identifier,))
-        result = self.cursor.fetchone()
-        return result[0] if result else None
+        topic_id = self._id_cache.get(identifier)
+        if topic_id is not None:
+            return topic_id
+
+        result = await self._fetchone(_SQL_TOPIC_ID, (identifier,))
+        if not result:
+            return None
+        self._id_cache[identifier] = result[0]
+        return result[0]
 
-    def get_topic_content(
+    async def get_topic_content(
         self, topic_identifier: int | str
     ) -> tuple[str, InlineKeyboardMarkup]:
         """Метод для получения контента и клавиатуры для темы"""
         if isinstance(topic_identifier, str):
-            topic_id = self.get_topic_id(topic_identifier)
-            if topic_id is None:
-                return "Тема не найдена", InlineKeyboardMarkup(inline_keyboard=[])
+            topic_id = self._id_cache.get(topic_identifier)
         else:
             topic_id = topic_identifier
 
-        self.cursor.execute(
-            "SELECT text, image_path, video_path FROM content WHERE topic_id = ?",
-            (topic_id,),
-        )
-        content_row = self.cursor.fetchone()
-        if not content_row:
-            return "Контент не найден", InlineKeyboardMarkup(inline_keyboard=[])
-
-        text = content_row[0]
-
-        self.cursor.execute(
-            """SELECT n.button_text, t.identifier
-               FROM navigation n
-               JOIN topics t ON n.target_topic_id = t.id
-               WHERE n.topic_id = ?
-               ORDER BY n.order_num""",
-            (topic_id,),
-        )
-        buttons = self.cursor.fetchall()
+        cached = self._content_cache.get(topic_id)
+        if cached is not None:
+            return cached
+
+        # один запрос вместо трёх (id темы -> контент -> кнопки навигации):
+        # каждая строка - это контент темы + одна её кнопка
+        # неподходящее условие получает NULL: иначе строка "1" из-за приведения
+        # типов в SQLite совпала бы с t.id = 1
+        if isinstance(topic_identifier, str):
+            params = (topic_identifier, None)
+        else:
+            params = (None, topic_identifier)
+        rows = await self._fetchall(_SQL_TOPIC_CONTENT, params)
+
+        if not rows:
+            if isinstance(topic_identifier, str):
+                return "Тема не найдена", EMPTY_KEYBOARD
+            return "Контент не найден", EMPTY_KEYBOARD
 
+        topic_id, text, image_path, video_path = rows[0][:4]
+        if isinstance(topic_identifier, str):
+            self._id_cache[topic_identifier] = topic_id
+        if text is None:
+            return "Контент не найден", EMPTY_KEYBOARD
+
+        buttons = [
+            (button_text, target_identifier)
+            for *_, button_text, target_identifier in rows
+            if button_text is not None and target_identifier is not None
+        ]
         keyboard = InlineKeyboardMarkup(
             inline_keyboard=[
                 [
@@ -192,47 +452,154 @@ class DatabaseManager:
             ]
         )
 
+        # заодно заполняем кэши кнопок и медиа - отдельные запросы уже не нужны
+        self._buttons_cache[topic_id] = buttons
+        self._media_cache[topic_id] = image_path, video_path
+        self._theory_cache[topic_id] = any(
+            button_text in THEORY_NAV_BUTTONS for button_text, _ in buttons
+        )
+        self._content_cache[topic_id] = text, keyboard
         return text, keyboard
 
-    def get_media_paths(
+    async def is_theory_topic(self, topic_identifier: int | str) -> bool:
+        """Метод для проверки, является ли тема слайдом теории (есть кнопки Далее/Назад)"""
+        if isinstance(topic_identifier, str):
+            topic_id = self._id_cache.get(topic_identifier)
+        else:
+            topic_id = topic_identifier
+
+        cached = self._theory_cache.get(topic_id)
+        if cached is not None:
+            return cached
+
+        # флаг вычисляется вместе с клавиатурой темы при её построении
+        await self.get_topic_content(topic_identifier)
+        if isinstance(topic_identifier, str):
+            topic_id = self._id_cache.get(topic_identifier)
+        return self._theory_cache.get(topic_id, False)
+
+    async def get_media_paths(
         self, topic_identifier: int | str
     ) -> tuple[str | None, str | None]:
         """Метод для получения путей к медиафайлам темы"""
         if isinstance(topic_identifier, str):
-            topic_id = self.get_topic_id(topic_identifier)
+            topic_id = await self.get_topic_id(topic_identifier)
             if topic_id is None:
                 return None, None
         else:
             topic_id = topic_identifier
 
-        self.cursor.execute(
-            "SELECT image_path, video_path FROM content WHERE topic_id = ?", (topic_id,)
-        )
-        row = self.cursor.fetchone()
-        return (row[0], row[1]) if row else (None, None)
+        cached = self._media_cache.get(topic_id)
+        if cached is not None:
+            return cached
+
+        row = await self._fetchone(_SQL_MEDIA, (topic_id,))
+        if not row:
+            return None, None
+        self._media_cache[topic_id] = row[0], row[1]
+        return row[0], row[1]
 
-    def get_topic_buttons(self, topic_identifier: int | str) -> list[tuple[str, str]]:
+    async def get_topic_buttons(
+        self, topic_identifier: int | str
+    ) -> list[tuple[str, str]]:
         """Метод для получения списка кнопок для темы"""
         if isinstance(topic_identifier, str):
-            topic_id = self.get_topic_id(topic_identifier)
+            topic_id = await self.get_topic_id(topic_identifier)
             if topic_id is None:
                 return []
         else:
             topic_id = topic_identifier
 
-        self.cursor.execute(
-            """SELECT n.button_text, t.identifier
-               FROM navigation n
-               JOIN topics t ON n.target_topic_id = t.id
-               WHERE n.topic_id = ?
-               ORDER BY n.order_num""",
-            (topic_id,),
-        )
-        return self.cursor.fetchall()
+        cached = self._buttons_cache.get(topic_id)
+        if cached is not None:
+            return cached
+
+        buttons = await self._fetchall(_SQL_NAVIGATION, (topic_id,))
+        self._buttons_cache[topic_id] = buttons
+        return buttons
+
+    def get_file_id(self, path: str, mtime: float) -> str | None:
+        """
+        Метод для получения file_id загруженного в Telegram медиафайла
 
-    def close(self):
+        Args:
+            path: путь к файлу
+            mtime: текущее время изменения файла
+
+        Returns:
+            str | None: file_id или None, если файл не загружался или изменился
+        """
+        cached = self._file_ids.get(path)
+        if cached is None or cached[0] != mtime:
+            return None
+        return cached[1]
+
+    async def save_file_id(self, path: str, mtime: float, file_id: str) -> None:
+        """
+        Метод для сохранения file_id медиафайла после его загрузки в Telegram
+
+        Args:
+            path: путь к файлу
+            mtime: время изменения загруженного файла
+            file_id: file_id, который вернул Telegram
+        """
+        self._file_ids[path] = mtime, file_id
+        autocommit = not self.conn.in_transaction
+        await self.conn.execute(_SQL_SAVE_FILE_ID, (path, mtime, file_id))
+        if autocommit:
+            await self.conn.commit()
+
+    async def forget_file_id(self, path: str) -> None:
+        """
+        Метод для удаления недействительного file_id медиафайла
+
+        Args:
+            path: путь к файлу
+        """
+        self._file_ids.pop(path, None)
+        autocommit = not self.conn.in_transaction
+        await self.conn.execute(_SQL_DELETE_FILE_ID, (path,))
+        if autocommit:
+            await self.conn.commit()
+
+    async def close(self):
         """метод для закрытия соединения с БД"""
-        self.conn.close()
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+
 
+# глобальный менеджер БД создаётся в bot.main (через init_db), а не при импорте модуля,
+# чтобы импорт хэндлеров не открывал БД и не загружал конфигурацию
+db_manager: DatabaseManager | None = None
 
-db_manager = DatabaseManager(load_config())
+
+async def init_db(config: Config) -> DatabaseManager:
+    """
+    Создаёт глобальный менеджер БД и открывает соединение
+
+    Args:
+        config: конфигурация приложения
+
+    Returns:
+        DatabaseManager: инициализированный менеджер БД
+    """
+    global db_manager
+    db_manager = DatabaseManager(config)
+    await db_manager.connect()
+    return db_manager
+
+
+def get_db_manager() -> DatabaseManager:
+    """
+    Возвращает глобальный менеджер БД
+
+    Raises:
+        RuntimeError: если init_db ещё не был вызван
+    """
+    if db_manager is None:
+        raise RuntimeError("БД не инициализирована: сначала нужно вызвать init_db()")
+    return db_manager
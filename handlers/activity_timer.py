@@ -5,7 +5,7 @@
 
 import asyncio
 import logging
-from typing import Optional
+from dataclasses import dataclass
 from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
@@ -14,6 +14,22 @@ from states import ContentState
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class _UserTimer:
+    """
+    состояние таймера активности одного пользователя
+
+    Attributes:
+        handle: запланированная через call_later проверка активности (None, если не запущена)
+        task: проверка активности, которая выполняется прямо сейчас (отправка напоминания)
+        msg_id: id сообщения-напоминания для возможности его удаления
+    """
+
+    handle: asyncio.TimerHandle | None = None
+    task: asyncio.Task | None = None
+    msg_id: int | None = None
+
+
 class ActivityTimerManager:
     """
     менеджер активности пользователей в боте
@@ -29,10 +45,10 @@ class ActivityTimerManager:
             delay_seconds: время в секундах бездействия, после которого отправляется напоминание
         """
         self._delay = delay_seconds
-        # словарь с таймерами для каждого пользователя
-        self._timers: dict[int, asyncio.Task] = {}
-        # словарь с id сообщений-напоминаний для возможности их удаления
-        self._messages: dict[int, int] = {}
+        # словарь с таймером и id сообщения-напоминания для каждого пользователя
+        # (таймер - это TimerHandle из call_later, а не спящая задача, так что
+        # перезапуск таймера на каждое действие пользователя не создаёт корутину и Task)
+        self._users: dict[int, _UserTimer] = {}
 
     async def start(self, user_id: int, state: FSMContext, bot: Bot) -> None:
         """
@@ -48,61 +64,82 @@ class ActivityTimerManager:
         # сначала отменяем любой существующий таймер для этого пользователя (на всякий)
         self.cancel(user_id)
 
-        async def check_activity():
-            """
-            функция проверки активности, которая выполняется после истечения таймера
-            отправляет сообщение с вопросом, продолжает ли пользователь изучать материал
-            """
-            try:
-                # ждем указанное время (заданное в delay, в секундах)
-                await asyncio.sleep(self._delay)
-                # проверяем текущее состояние пользователя
-                current_state = await state.get_state()
-
-                # проверяем только пользователей, которые находятся в режиме просмотра контента
-                # (т.е. в выборе предмета, подтемы, скроллинге подтемы)
-                if current_state in [
-                    ContentState.IN_TOPICS.state,
-                    ContentState.IN_LECTURE.state,
-                ]:
-                    # удаляем предыдущее сообщение о проверке активности, если оно было (чтобы было тольо 1)
-                    old_msg_id = self._messages.get(user_id)
-                    if old_msg_id:
-                        await bot.delete_message(user_id, old_msg_id)
-
-                    # отправляем новое сообщение с вопросом о продолжении работы
-                    msg = await bot.send_message(
-                        user_id,
-                        "Привет! Ты еще изучаешь материал?",
-                        reply_markup=InlineKeyboardMarkup(
-                            inline_keyboard=[
-                                [
-                                    InlineKeyboardButton(
-                                        text="Да", callback_data="still_learning"
-                                    ),
-                                    InlineKeyboardButton(
-                                        text="Нет, верни в начало",
-                                        callback_data="return_to_menu",
-                                    ),
-                                ]
+        entry = self._users.setdefault(user_id, _UserTimer())
+        entry.handle = asyncio.get_running_loop().call_later(
+            self._delay, self._on_timer, user_id, state, bot
+        )
+
+    def _on_timer(self, user_id: int, state: FSMContext, bot: Bot) -> None:
+        """
+        колбэк call_later: время ожидания истекло, запускаем проверку активности
+
+        Args:
+            user_id: идентификатор пользователя
+            state: состояние FSM пользователя
+            bot: экземпляр бота для отправки сообщений
+        """
+        entry = self._users.get(user_id)
+        if entry is None:
+            return
+        entry.handle = None
+        # ссылку на задачу храним в entry, чтобы её не собрал GC и её можно было отменить
+        entry.task = asyncio.create_task(self._check_activity(user_id, state, bot))
+
+    async def _check_activity(self, user_id: int, state: FSMContext, bot: Bot):
+        """
+        функция проверки активности, которая выполняется после истечения таймера
+        отправляет сообщение с вопросом, продолжает ли пользователь изучать материал
+        """
+        try:
+            # проверяем текущее состояние пользователя
+            current_state = await state.get_state()
+
+            # проверяем только пользователей, которые находятся в режиме просмотра контента
+            # (т.е. в выборе предмета, подтемы, скроллинге подтемы)
+            if current_state in [
+                ContentState.IN_TOPICS.state,
+                ContentState.IN_LECTURE.state,
+            ]:
+                # удаляем предыдущее сообщение о проверке активности, если оно было (чтобы было тольо 1)
+                entry = self._users.get(user_id)
+                old_msg_id = entry.msg_id if entry else None
+                if old_msg_id:
+                    await bot.delete_message(user_id, old_msg_id)
+
+                # отправляем новое сообщение с вопросом о продолжении работы
+                msg = await bot.send_message(
+                    user_id,
+                    "Привет! Ты еще изучаешь материал?",
+                    reply_markup=InlineKeyboardMarkup(
+                        inline_keyboard=[
+                            [
+                                InlineKeyboardButton(
+                                    text="Да", callback_data="still_learning"
+                                ),
+                                InlineKeyboardButton(
+                                    text="Нет, верни в начало",
+                                    callback_data="return_to_menu",
+                                ),
                             ]
-                        ),
-                        parse_mode="HTML",
-                    )
-                    self._messages[user_id] = msg.message_id
-
-            except asyncio.CancelledError:
-                # обработка отмены таймера - ничего не делаем, просто выходим
-                pass
-            except Exception as e:
-                logger.error(f"ошибка в таймере активности: {e}")
-            finally:
-                # в любом случае убираем таймер из словаря после его срабатывания
-                self._timers.pop(user_id, None)
-
-        # создаем новую задачу и сохраняем ее в словаре таймеров
-        task = asyncio.create_task(check_activity())
-        self._timers[user_id] = task
+                        ]
+                    ),
+                    parse_mode="HTML",
+                )
+                self._users.setdefault(user_id, _UserTimer()).msg_id = msg.message_id
+
+        except asyncio.CancelledError:
+            # обработка отмены таймера - ничего не делаем, просто выходим
+            pass
+        except Exception as e:
+            logger.error("ошибка в таймере активности: %s", e)
+        finally:
+            # в любом случае убираем ссылку на задачу после её завершения
+            entry = self._users.get(user_id)
+            if entry is not None and entry.task is asyncio.current_task():
+                entry.task = None
+                # напоминание не отправлено и таймер не перезапущен - запись не нужна
+                if entry.handle is None and entry.msg_id is None:
+                    self._users.pop(user_id, None)
 
     def cancel(self, user_id: int):
         """
@@ -111,9 +148,17 @@ class ActivityTimerManager:
         Args:
             user_id: идентификатор пользователя
         """
-        task = self._timers.pop(user_id, None)
-        if task:
-            task.cancel()
+        entry = self._users.get(user_id)
+        if entry is None:
+            return
+        if entry.handle is not None:
+            entry.handle.cancel()
+            entry.handle = None
+        if entry.task is not None:
+            entry.task.cancel()
+            entry.task = None
+        if entry.msg_id is None:
+            del self._users[user_id]
 
     def forget_message(self, user_id: int):
         """
@@ -122,7 +167,12 @@ class ActivityTimerManager:
         Args:
             user_id: идентификатор пользователя
         """
-        self._messages.pop(user_id, None)
+        entry = self._users.get(user_id)
+        if entry is None:
+            return
+        entry.msg_id = None
+        if entry.handle is None and entry.task is None:
+            del self._users[user_id]
 
     def reset(self, user_id: int):
         """
@@ -132,8 +182,8 @@ class ActivityTimerManager:
         Args:
             user_id: идентификатор пользователя
         """
-        self.cancel(user_id)
         self.forget_message(user_id)
+        self.cancel(user_id)
 
 
 activity_timer = ActivityTimerManager()
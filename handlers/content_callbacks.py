@@ -2,11 +2,13 @@
 модуль обработки callback-запросов для контентной части бота
 """
 
+import asyncio
 import logging
-import os
 from aiogram import Router, F, Bot
-from aiogram.types import CallbackQuery
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
 
 from states import ContentState
 from handlers.activity_timer import activity_timer
@@ -18,6 +20,21 @@ logger = logging.getLogger(__name__)
 router = Router()
 
 
+# точные совпадения callback_data -> состояние (проверяются поиском в словаре)
+_STATE_MAP: dict[str, State] = {
+    "start": ContentState.IN_MENU,
+    "linear_algebra": ContentState.IN_TOPICS,
+    "geometry": ContentState.IN_TOPICS,
+    "calculus": ContentState.IN_TOPICS,
+}
+
+# подстроки callback_data -> состояние (только если точного совпадения нет)
+_SUBSTRING_MAP: tuple[tuple[str, State], ...] = (
+    ("matrix", ContentState.IN_LECTURE),
+    ("vector", ContentState.IN_LECTURE),
+)
+
+
 async def update_user_state(callback_data: str, state: FSMContext) -> None:
     """этот метод устанавливает состояние пользователя на основе выбранного раздела
     Args:
@@ -26,40 +43,29 @@ async def update_user_state(callback_data: str, state: FSMContext) -> None:
     Returns:
         None
     """
-    if callback_data == "start":
-        await state.set_state(ContentState.IN_MENU)
-    elif callback_data in ["linear_algebra", "geometry", "calculus"]:
-        await state.set_state(ContentState.IN_TOPICS)
-    elif "matrix" in callback_data or "vector" in callback_data:
-        await state.set_state(ContentState.IN_LECTURE)
+    new_state = _STATE_MAP.get(callback_data)
+    if new_state is not None:
+        await state.set_state(new_state)
+        return
+    for substring, substring_state in _SUBSTRING_MAP:
+        if substring in callback_data:
+            await state.set_state(substring_state)
+            return
 
 
-async def find_media_file(media_path: str) -> str:
-    """метод для нахождения пути  к медиафайлу
+async def remove_keyboard(message: Message) -> None:
+    """метод для удаления инлайн-клавиатуры у сообщения
     Args:
-        media_path: путь к медиафайлу (может быть относительным или абсолютным)
+        message: сообщение, у которого убираем клавиатуру
     Returns:
-        str: полный путь к найденному файлу или None если файл не найден
+        None
     """
-
-    if not media_path:
-        return None
-
-    path = media_path.replace("\\", "/")
-    path = path.replace("../", "").replace("./", "")
-
-    filename = os.path.basename(path)
-
-    standard_path = os.path.join("content", "images", filename)
-    if os.path.exists(standard_path):
-        return standard_path
-
-    alt_path = os.path.join("images", filename)
-    if os.path.exists(alt_path):
-        return alt_path
-
-    logger.error(f"файл не найден: {media_path}")
-    return None
+    try:
+        await message.edit_reply_markup(reply_markup=None)
+    except TelegramBadRequest as e:
+        # клавиатуру уже убрали (например, повторное нажатие кнопки)
+        if "message is not modified" not in str(e):
+            raise
 
 
 @router.callback_query(F.data == "still_learning")
@@ -96,7 +102,7 @@ async def handle_return_to_menu(callback: CallbackQuery, state: FSMContext) -> N
     user_id = callback.from_user.id
     await callback.message.delete()
     await state.clear()
-    text, kb = keyboard_manager.get_keyboard("start")
+    text, kb = await keyboard_manager.get_keyboard("start")
     msg = await callback.message.answer(text, reply_markup=kb, parse_mode="HTML")
     user_original_messages[user_id] = msg.message_id
     await callback.answer()
@@ -125,7 +131,7 @@ async def handle_content(callback: CallbackQuery, state: FSMContext, bot: Bot) -
         return
 
     # получаем данные меню по callback_data
-    menu = keyboard_manager.get_menu(callback_data)
+    menu = await keyboard_manager.get_menu(callback_data)
     if not menu:
         await callback.answer(
             "контент недоступен: возможно, нет теории в данной подтеме"
@@ -134,11 +140,9 @@ async def handle_content(callback: CallbackQuery, state: FSMContext, bot: Bot) -
 
     await update_user_state(callback_data, state)
 
-    # проверка, является ли это навигацией по теории (т.е. кнопки Далее/Назад)
-    is_theory_navigation = any(
-        button[0] in ["➡️ Далее", "⬅️ Назад"]
-        for button in keyboard_manager.get_buttons(callback_data)
-    )
+    # проверка, является ли это навигацией по теории (т.е. кнопки Далее/Назад),
+    # флаг вычисляется один раз при построении клавиатуры темы
+    is_theory_navigation = menu.get("is_theory", False)
 
     if not is_theory_navigation:
         # Для обычной навигации  редачим существующее сообщение
@@ -157,13 +161,29 @@ async def handle_content(callback: CallbackQuery, state: FSMContext, bot: Bot) -
             ]:
                 await activity_timer.start(user_id, state, bot)
             return
-        except:
+        except TelegramBadRequest as e:
+            # повторное нажатие той же кнопки: сообщение уже показывает нужный контент,
+            # не нужно удалять его и отправлять заново
+            if "message is not modified" in str(e):
+                await callback.answer()
+                return
+            # иначе сообщение нельзя отредактировать (например, это фото/видео) - пересылаем
             await callback.message.delete()
+        msg = await send_menu_content(callback.message, menu)
     else:
-        # Для удаления клавы со старого сообщения
-        await callback.message.edit_reply_markup(reply_markup=None)
+        # удаление клавы со старого сообщения и отправка нового слайда независимы,
+        # поэтому выполняем их параллельно, а не двумя последовательными запросами
+        # ошибка удаления клавиатуры не должна мешать ответу на callback
+        removed, msg = await asyncio.gather(
+            remove_keyboard(callback.message),
+            send_menu_content(callback.message, menu),
+            return_exceptions=True,
+        )
+        if isinstance(removed, BaseException):
+            logger.warning("не удалось убрать клавиатуру: %s", removed)
+        if isinstance(msg, BaseException):
+            raise msg
 
-    msg = await send_menu_content(callback.message, menu)
     user_original_messages[user_id] = msg.message_id
     await callback.answer()
 
@@ -17,12 +17,10 @@ class InteractiveUser:
     Attributes:
         user_id: ID пользователя
         chat_id: ID чата
-        lock: asyncio.Lock
     """
 
     user_id: int
     chat_id: int
-    lock: asyncio.Lock
 
 
 class InteractiveState:
@@ -49,11 +47,17 @@ class InteractiveState:
         Returns:
             bool: True если удалось захватить, False если режим занят
         """
+        # быстрый путь без блокировки: режим занят другим пользователем.
+        # asyncio однопоточный, а _active_user меняется только внутри этого класса,
+        # поэтому чтение поля до захвата lock безопасно
+        active_user = self._active_user
+        if active_user is not None and active_user.user_id != user_id:
+            return False
+
         async with self._global_lock:
+            # повторная проверка под блокировкой (пока ждали lock, режим могли занять)
             if self._active_user is None:
-                self._active_user = InteractiveUser(
-                    user_id=user_id, chat_id=chat_id, lock=asyncio.Lock()
-                )
+                self._active_user = InteractiveUser(user_id=user_id, chat_id=chat_id)
                 return True
             return self._active_user.user_id == user_id
 
@@ -5,9 +5,13 @@
 пользователь, взаимодействующий с LLM в данном случае)
 """
 
+import asyncio
+import hashlib
 import logging
+from collections import OrderedDict
 
 from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import (
     Message,
     ReplyKeyboardMarkup,
@@ -21,20 +25,117 @@ from keyboards.keyboards import keyboard_manager
 from states import InteractiveMode
 from .access import interactive_state
 from llm.worker import llm_worker
-from llm.prompt_builder import build_prompt, process_response
+from llm.prompt_builder import (
+    FALLBACK_RESPONSE,
+    REJECTED_PREFIX,
+    build_prompt_async,
+    process_response,
+)
+from llm.semantic_cache import semantic_cache
 from llm.system_prompts import MATH_PROMPT
 from handlers.activity_timer import activity_timer
 
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 r: Router = Router(name="interactive_mode")
 
 
+# кэш ответов LLM на одинаковые вопросы: ключ - хэш режима и очищенного текста
+RESPONSE_CACHE_SIZE = 1024
+_response_cache: OrderedDict[str, str] = OrderedDict()
+
+
+def _cache_key(mode: str, user_input: str) -> str:
+    """
+    ключ кэша ответов
+
+    Args:
+        mode: режим работы LLM
+        user_input: очищенный текст пользователя
+
+    Returns:
+        str: хэш нормализованного запроса
+    """
+    normalized = f"{mode}|{user_input.strip().lower()}"
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+
+# ограничения на длину вопроса к LLM (в символах)
+MIN_INPUT_LENGTH = 2
+MAX_INPUT_LENGTH = 2000
+
+# тексты интерактивного режима
+EXIT_BUTTON_TEXT = "Выйти из интерактивного режима"
+ENTER_MSG = (
+    "Ты вошел в интерактивный режим. Теперь ты можешь общаться с ботом.\n"
+    f"для выхода нажми кнопку '{EXIT_BUTTON_TEXT}'"
+)
+BUSY_MSG = (
+    "Извиняюсь, но интерактивный режим сейчас занят другим пользователем. "
+    "Пожалуйста, подожди и попробуй позже =)"
+)
+EXIT_MSG = "Ты вышел из интерактивного режима"
+QUEUE_MSG = "Перед твоим вопросом в очереди ещё {position}, ответ будет чуть позже"
+EMPTY_INPUT_MSG = "Напиши свой вопрос текстом =)"
+LONG_INPUT_MSG = (
+    f"Слишком длинное сообщение. Пожалуйста, уложись в {MAX_INPUT_LENGTH} символов"
+)
+ERROR_MSG = "извини, произошла ошибка при обработке твоего сообщения. попробуй еще раз."
+
+
+class AnswerDraft:
+    """
+    сообщение с ответом, которое обновляется по мере генерации:
+    первый частичный ответ отправляется, следующие - редактируют его
+    """
+
+    def __init__(self, message: Message):
+        """
+        Args:
+            message: сообщение пользователя, на которое отвечаем
+        """
+        self.message = message
+        self.sent: Message | None = None
+
+    async def update(self, text: str) -> None:
+        """
+        показать частичный ответ
+
+        Args:
+            text: ответ на данный момент
+        """
+        try:
+            if self.sent is None:
+                self.sent = await self.message.answer(text)
+            else:
+                await self.sent.edit_text(text)
+        except TelegramBadRequest as e:
+            # текст не изменился с прошлого обновления
+            if "message is not modified" not in str(e):
+                raise
+
+    async def finish(self, text: str) -> None:
+        """
+        показать итоговый ответ (в том же сообщении, если частичный уже отправлен)
+
+        Args:
+            text: итоговый ответ
+        """
+        if self.sent is None:
+            await self.message.answer(text)
+            return
+        try:
+            await self.sent.edit_text(text)
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                logger.warning("не удалось обновить ответ: %s", e)
+                await self.message.answer(text)
+
+
 EXIT_KEYBOARD = ReplyKeyboardMarkup(
-    keyboard=[[KeyboardButton(text="Выйти из интерактивного режима")]],
+    keyboard=[[KeyboardButton(text=EXIT_BUTTON_TEXT)]],
     resize_keyboard=True,
     one_time_keyboard=True,
 )
@@ -66,11 +167,7 @@ async def enter_interactive_mode(callback: CallbackQuery, state: FSMContext) ->
         if not can_enter:
             active_user = interactive_state.get_active_user()
             if active_user and active_user.user_id != callback.from_user.id:
-                await callback.answer(
-                    "Извиняюсь, но интерактивный режим сейчас занят другим пользователем. "
-                    "Пожалуйста, подожди и попробуй позже =)",
-                    show_alert=True,
-                )
+                await callback.answer(BUSY_MSG, show_alert=True)
                 return
 
         # устанавливаем FSM состояние чата (chatting)
@@ -78,11 +175,10 @@ async def enter_interactive_mode(callback: CallbackQuery, state: FSMContext) ->
         current_state = await state.get_state()
         logger.info("текущее состояние после установки: %s", current_state)
 
-        await callback.message.delete()
-        await callback.message.answer(
-            "Ты вошел в интерактивный режим. Теперь ты можешь общаться с ботом.\n"
-            "для выхода нажми кнопку 'Выйти из интерактивного режима'",
-            reply_markup=EXIT_KEYBOARD,
+        # удаление меню и приветствие не зависят друг от друга - отправляем параллельно
+        await asyncio.gather(
+            callback.message.delete(),
+            callback.message.answer(ENTER_MSG, reply_markup=EXIT_KEYBOARD),
         )
     except Exception as e:
         logger.error("ошибка при входе в интерактивный режим: %s", str(e))
@@ -93,7 +189,7 @@ async def enter_interactive_mode(callback: CallbackQuery, state: FSMContext) ->
             logger.error("не удалось ответить на callback", exc_info=True)
 
 
-@r.message(F.text == "Выйти из интерактивного режима", InteractiveMode.chatting)
+@r.message(F.text == EXIT_BUTTON_TEXT, InteractiveMode.chatting)
 async def exit_interactive_mode(message: Message, state: FSMContext) -> None:
     """
     обработчик для выхода из интерактивного режима
@@ -116,12 +212,11 @@ async def exit_interactive_mode(message: Message, state: FSMContext) -> None:
 
     # очищаем (по сути обнуляем состояние FSM для пользователя) и переходим в главное меню.
     await state.clear()
-    await message.answer(".", reply_markup=ReplyKeyboardRemove())
-    await message.bot.delete_message(
-        chat_id=message.chat.id, message_id=message.message_id + 1
-    )
+    # reply-клавиатуру можно убрать только отдельным сообщением (у сообщения меню
+    # уже есть инлайн-клавиатура), поэтому убираем её вместе с уведомлением о выходе
+    await message.answer(EXIT_MSG, reply_markup=ReplyKeyboardRemove())
 
-    text, kb = keyboard_manager.get_keyboard("start")
+    text, kb = await keyboard_manager.get_keyboard("start")
     await message.answer(text, reply_markup=kb)
     logger.info("пользователь %s вернулся в главное меню", user_id)
 
@@ -145,6 +240,17 @@ async def process_message(message: Message, state: FSMContext) -> None:
     # проверяем, что пользователь имеет доступ к интерактивному режиму
     active_user = interactive_state.get_active_user()
 
+    # пустые (стикеры, фото без подписи), слишком короткие и слишком длинные сообщения
+    # отсекаем до проверки безопасности и запроса к модели
+    text = (message.text or "").strip()
+    if len(text) < MIN_INPUT_LENGTH:
+        await message.answer(EMPTY_INPUT_MSG)
+        return
+    if len(text) > MAX_INPUT_LENGTH:
+        await message.answer(LONG_INPUT_MSG)
+        return
+
+    draft = AnswerDraft(message)
     try:
         # показываем пользователю, что бот печатает (хотя ограничения у TG API есть, но мы их обходим с помощью
         # блока интарктивного режима для 1 пользователя, т.е. больше чаттиться одноврепменно не могут)
@@ -153,19 +259,50 @@ async def process_message(message: Message, state: FSMContext) -> None:
         )
 
         # формируем промпт и отправляем запрос к LLM
-        prompt = build_prompt(message.text, mode="math")
-        logger.info("отправка запроса к LLM...")
+        prompt = await build_prompt_async(text, mode="math")
+        user_input = prompt[-1]["content"]
+        cacheable = not user_input.startswith(REJECTED_PREFIX)
+        key = _cache_key("math", user_input)
+
+        answer = _response_cache.get(key) if cacheable else None
+        if answer is not None:
+            _response_cache.move_to_end(key)
+            logger.info("ответ найден в кэше")
+        else:
+            # при промахе точного кэша ищем ответ на похожий по смыслу вопрос
+            vector = None
+            if cacheable and semantic_cache.enabled:
+                answer, vector = await semantic_cache.lookup(user_input)
 
-        answer = await llm_worker.generate_response(prompt)
-        answer = process_response(answer, MATH_PROMPT)
+            if answer is None:
+                position = llm_worker.pending_requests()
+                if position:
+                    await message.answer(QUEUE_MSG.format(position=position))
+                logger.info("отправка запроса к LLM...")
+                # ответ показывается по мере генерации и дописывается в то же сообщение
+                raw_answer = await llm_worker.generate_response(
+                    prompt, on_partial=draft.update
+                )
+                answer = process_response(raw_answer, MATH_PROMPT)
+
+                # ошибки, таймауты и заглушку вместо пустого ответа не кэшируем,
+                # чтобы следующий такой же вопрос снова ушёл в модель
+                failed = answer == FALLBACK_RESPONSE or raw_answer in (
+                    llm_worker.config["error_message"],
+                    llm_worker.config["timeout_message"],
+                )
+                if cacheable and not failed:
+                    _response_cache[key] = answer
+                    if len(_response_cache) > RESPONSE_CACHE_SIZE:
+                        _response_cache.popitem(last=False)
+                    if vector is not None:
+                        semantic_cache.add(vector, answer)
 
         logger.info("ответ сгенерирован, отправляем пользователю")
-        await message.answer(answer)
+        await draft.finish(answer)
         logger.info("ответ отправлен")
 
     except Exception as e:
         logger.error("ошибка при обработке сообщения: %s", str(e), exc_info=True)
-        await message.answer(
-            "извини, произошла ошибка при обработке твоего сообщения. "
-            "попробуй еще раз."
-        )
+        # сообщение об ошибке заменяет уже показанный частичный ответ
+        await draft.finish(ERROR_MSG)
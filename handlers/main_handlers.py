@@ -29,7 +29,7 @@ async def cmd_start(message: Message, state: FSMContext) -> None:
     activity_timer.reset(user_id)
     await state.clear()
     # клавиатура для стартового меню
-    text, kb = keyboard_manager.get_keyboard("start")
+    text, kb = await keyboard_manager.get_keyboard("start")
     msg = await message.answer(text, reply_markup=kb, parse_mode="HTML")
     user_original_messages[user_id] = msg.message_id
 
@@ -43,5 +43,5 @@ async def cmd_help(message: Message) -> None:
     Args:
         message: сообщение пользователя
     """
-    text, kb = keyboard_manager.get_keyboard("help")
+    text, kb = await keyboard_manager.get_keyboard("help")
     await message.answer(text, reply_markup=kb, parse_mode="HTML")
@@ -34,7 +34,7 @@ class KeyboardManager:
             ]
         )
 
-    def get_keyboard(self, topic_id: str) -> tuple[str, InlineKeyboardMarkup]:
+    async def get_keyboard(self, topic_id: str) -> tuple[str, InlineKeyboardMarkup]:
         """
         получение текста и клавиатуры для темы предмета
 
@@ -44,11 +44,10 @@ class KeyboardManager:
         Returns:
             tuple: текст и клавиатура для темы
         """
-        text, buttons = menu_loader.get_topic_content(topic_id)
-        keyboard = self.build_keyboard(buttons)
-        return text, keyboard
+        # готовая клавиатура берётся из кэша db_manager, а не строится заново
+        return await menu_loader.get_topic_content(topic_id)
 
-    def get_menu(self, topic_id: str) -> dict:
+    async def get_menu(self, topic_id: str) -> dict:
         """
         получение всех данных меню, включая медиафайлы
 
@@ -58,19 +57,9 @@ class KeyboardManager:
         Returns:
             dict: словарь с данными меню (текст, клавиатуру и пути к медиафайлам)
         """
-        menu_data = menu_loader.get_menu_data(topic_id)
+        return await menu_loader.get_menu_data(topic_id)
 
-        # Преобразуем список кнопок в клавиатуру для tg
-        keyboard = self.build_keyboard(menu_data.pop("buttons"))
-
-        # ввозвращаем данные с клавиатурой вместо списка кнопок
-        return {
-            "text": menu_data["text"],
-            "keyboard": keyboard,
-            **{k: v for k, v in menu_data.items() if k not in ["text", "buttons"]},
-        }
-
-    def get_buttons(self, topic_id: str) -> list[tuple[str, str]]:
+    async def get_buttons(self, topic_id: str) -> list[tuple[str, str]]:
         """
         получение списка кнопок для темы предмета
 
@@ -80,7 +69,16 @@ class KeyboardManager:
         Returns:
             list: список кортежей (текст кнопки, callback_data)
         """
-        return menu_loader.get_buttons(topic_id)
+        return await menu_loader.get_buttons(topic_id)
+
+    def invalidate(self, topic_id: str):
+        """
+        сброс закэшированной клавиатуры и данных меню темы (после правки контента)
+
+        Args:
+            topic_id: идентификатор темы
+        """
+        menu_loader.invalidate(topic_id)
 
 
 keyboard_manager = KeyboardManager()
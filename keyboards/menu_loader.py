@@ -3,7 +3,8 @@
 отделяет логику получения данных от построения UI
 """
 
-from database.db_manager import db_manager
+from aiogram.types import InlineKeyboardMarkup
+from database.db_manager import DatabaseManager, get_db_manager
 
 
 class MenuLoader:
@@ -11,55 +12,93 @@ class MenuLoader:
     загрузчик данных меню из базы данных
     """
 
-    def __init__(self, db_manager):
+    def __init__(self, db_manager: DatabaseManager | None = None):
         """
         инициализация загрузчика меню
 
         Args:
-            db_manager: менеджер базы данных
+            db_manager: менеджер базы данных (по умолчанию - глобальный,
+                который создаётся в bot.main через init_db)
         """
-        self.db = db_manager
-
-    def get_topic_content(self, topic_id: str) -> tuple[str, list[tuple[str, str]]]:
+        self._db = db_manager
+        # собранные данные меню по темам; сбрасываются, когда меняется
+        # cache_version менеджера БД (запись в БД или invalidate)
+        self._menu_cache: dict[str, dict] = {}
+        self._menu_cache_version = -1
+
+    @property
+    def db(self) -> DatabaseManager:
+        """менеджер базы данных, с которым работает загрузчик"""
+        return self._db if self._db is not None else get_db_manager()
+
+    async def get_topic_content(
+        self, topic_id: str
+    ) -> tuple[str, InlineKeyboardMarkup]:
         """
-        получает текст и список кнопок для темы
+        получает текст и клавиатуру для темы
+        (клавиатура строится один раз в db_manager и переиспользуется из кэша)
 
         Args:
             topic_id: идентификатор темы
 
         Returns:
-            tuple: текст и список кнопок (текст, callback_data)
+            tuple: текст и клавиатура для темы
         """
-        text, _ = self.db.get_topic_content(
-            topic_id
-        )  # Игнорируем построенную клавиатуру
-        buttons = self.db.get_topic_buttons(topic_id)
-        return text, buttons
+        return await self.db.get_topic_content(topic_id)
 
-    def get_menu_data(self, topic_id: str) -> dict:
+    async def get_menu_data(self, topic_id: str) -> dict:
         """
         получает все данные меню для темы, включая медиафайлы
+        (словарь собирается один раз на тему и переиспользуется - не изменять его)
 
         Args:
             topic_id: идентификатор темы
 
         Returns:
-            dict: словарь с данными меню (текст, кнопки и пути к медиафайлам)
+            dict: словарь с данными меню (текст, клавиатура, флаг слайда теории
+                и пути к медиафайлам)
         """
-        text, _ = self.db.get_topic_content(topic_id)
-        buttons = self.db.get_topic_buttons(topic_id)
+        db = self.db
+        if self._menu_cache_version != db.cache_version:
+            self._menu_cache.clear()
+            self._menu_cache_version = db.cache_version
+
+        result = self._menu_cache.get(topic_id)
+        if result is not None:
+            return result
+
+        text, keyboard = await db.get_topic_content(topic_id)
 
-        result = {"text": text, "buttons": buttons}
+        result = {
+            "text": text,
+            "keyboard": keyboard,
+            "is_theory": await db.is_theory_topic(topic_id),
+        }
 
-        image_path, video_path = self.db.get_media_paths(topic_id)
+        image_path, video_path = await db.get_media_paths(topic_id)
         if image_path:
             result["image"] = image_path
         if video_path:
             result["video"] = video_path
 
+        # кэшируем только существующие темы, чтобы произвольные callback_data
+        # не раздували кэш
+        if await db.get_topic_id(topic_id) is not None:
+            self._menu_cache[topic_id] = result
         return result
 
-    def get_buttons(self, topic_id: str) -> list[tuple[str, str]]:
+    def invalidate(self, topic_id: str):
+        """
+        сброс закэшированных данных меню темы (например, после ручного
+        редактирования контента в БД)
+
+        Args:
+            topic_id: идентификатор темы
+        """
+        # db_manager увеличит cache_version, и собранные меню сбросятся
+        self.db.invalidate(topic_id)
+
+    async def get_buttons(self, topic_id: str) -> list[tuple[str, str]]:
         """
         получает список кнопок для темы
 
@@ -69,7 +108,7 @@ class MenuLoader:
         Returns:
             list: список кортежей (текст кнопки, callback_data)
         """
-        return self.db.get_topic_buttons(topic_id)
+        return await self.db.get_topic_buttons(topic_id)
 
 
-menu_loader = MenuLoader(db_manager)
+menu_loader = MenuLoader()
@@ -2,48 +2,105 @@
 Vодуль для построения промптов для LLM
 """
 
+import asyncio
+import logging
+import re
+
 from llm.system_prompts import SYSTEM_PROMPTS, DEFAULT_PROMPT
 from llm.safety_guard import safety_guard
-import logging
 
 logger = logging.getLogger(__name__)
 
+# служебные маркеры чата (<|...|> у QWEN, <s>/</s> и [INST]/[/INST] у Llama/Mistral)
+# и блоки <input>...</input> в ответе модели - одна альтернатива, один проход
+_CLEANUP_RE = re.compile(r"<\|[^|>]*\|>|</?s>|\[/?INST\]|<input>.*?</input>", re.DOTALL)
 
-def build_prompt(user_input: str, mode: str = "math"):
+# пометка для ввода, отклонённого системой безопасности
+REJECTED_PREFIX = "[запрос отклонен системой безопасности]"
+# ответ вместо слишком короткого (после очистки) ответа модели
+FALLBACK_RESPONSE = "Извини, я не смог сгенерировать подходящий ответ. Попробуйте переформулировать вопрос."
+
+
+def _check_input(user_input: str) -> str:
     """
-    создает промпт для LLM с системным контекстом и вводом пользователя
-    проверяет безопасность ввода пользователя с помощью safe_guard
+    проверяет безопасность ввода пользователя с помощью safe_guard и очищает его
 
     Args:
         user_input: текст от пользователя
-        mode: режим работы (math только)
 
     Returns:
-        список сообщений в формате чата
+        очищенный текст (с пометкой, если запрос отклонен системой безопасности)
     """
-    system_prompt = SYSTEM_PROMPTS.get(mode, DEFAULT_PROMPT)
-
     if not isinstance(user_input, str):
         user_input = str(user_input)
 
+    # очищаем ввод от потенциально опасных конструкций (html тэги, прочее) один раз
+    # и проверяем уже очищенный текст: теги и лишние пробелы не спрячут запретную фразу
+    user_input = safety_guard.sanitize(user_input)
+
     # ЗДЕСЬ проверяем безопасность ввода с safe_guard
     safety_result = safety_guard.check(user_input)
     if not safety_result.is_safe:
         logger.warning(
-            f"обнаружено нарушение безопасности: {safety_result.violation}, причина: {safety_result.reason}"
+            "обнаружено нарушение безопасности: %s, причина: %s",
+            safety_result.violation,
+            safety_result.reason,
         )
-        user_input = f"[запрос отклонен системой безопасности] {user_input}"
+        user_input = f"{REJECTED_PREFIX} {user_input}"
+
+    return user_input
 
-    # очищаем ввод от потенциально опасных конструкций (html тэги, прочее)
-    user_input = safety_guard.sanitize(user_input)
 
-    # Возвращаем простой список из двух сообщений (в  соответствии с структурой длЯ QWEN)
+# системные сообщения одинаковы для всех запросов режима - собираем их один раз
+_SYSTEM_MESSAGES = {
+    mode: {"role": "system", "content": prompt}
+    for mode, prompt in SYSTEM_PROMPTS.items()
+}
+_DEFAULT_SYSTEM_MESSAGE = {"role": "system", "content": DEFAULT_PROMPT}
+
+
+def _chat_messages(mode: str, user_input: str) -> list[dict]:
+    """
+    Возвращаем простой список из двух сообщений (в  соответствии с структурой длЯ QWEN)
+    (системное сообщение общее для всех запросов - не изменять его)
+    """
     return [
-        {"role": "system", "content": system_prompt},
+        _SYSTEM_MESSAGES.get(mode, _DEFAULT_SYSTEM_MESSAGE),
         {"role": "user", "content": user_input},
     ]
 
 
+def build_prompt(user_input: str, mode: str = "math"):
+    """
+    создает промпт для LLM с системным контекстом и вводом пользователя
+    проверяет безопасность ввода пользователя с помощью safe_guard
+
+    Args:
+        user_input: текст от пользователя
+        mode: режим работы (math только)
+
+    Returns:
+        список сообщений в формате чата
+    """
+    return _chat_messages(mode, _check_input(user_input))
+
+
+async def build_prompt_async(user_input: str, mode: str = "math"):
+    """
+    асинхронный вариант build_prompt для обработчиков бота:
+    проверка безопасности выполняется в отдельном потоке и не блокирует цикл событий
+
+    Args:
+        user_input: текст от пользователя
+        mode: режим работы (math только)
+
+    Returns:
+        список сообщений в формате чата
+    """
+    user_input = await asyncio.to_thread(_check_input, user_input)
+    return _chat_messages(mode, user_input)
+
+
 def process_response(response: str, system_prompt: str = None) -> str:
     """
     Метод обрабатывает ответ от LLM, удаляя служебные части,
@@ -62,23 +119,23 @@ def process_response(response: str, system_prompt: str = None) -> str:
         logger.debug("удаление системного промпта из ответа")
         response = response.replace(system_prompt, "").strip()
 
-    logger.debug("удаление специальных токенов из ответа")
-    response = response.replace("<|im_start|>", "").replace("<|im_end|>", "").strip()
-    response = response.replace("<|user|>", "").replace("<|assistant|>", "").strip()
-
-    if "<input>" in response and "</input>" in response:
-        logger.debug("удаление тегов input из ответа")
-        start = response.find("<input>")
-        end = response.find("</input>") + len("</input>")
-        response = response[:start] + response[end:]
-
-    last_dot = response.rfind(".")
-    if last_dot != -1 and last_dot > len(response) // 2:
-        logger.debug(f"обрезка ответа на последней точке (поз {last_dot})")
-        response = response[: last_dot + 1].strip()
+    # спецтокены и блок <input>...</input> удаляются за один проход по строке;
+    # ответ декодируется без спецтокенов, так что обычно маркеров в нём нет вовсе
+    if "<" in response or "INST]" in response:
+        response = _CLEANUP_RE.sub("", response)
+    response = response.strip()
+
+    # обрезаем незаконченное предложение, если последняя точка во второй половине ответа
+    # (ответ уже без пробелов по краям, поэтому после среза strip не нужен;
+    # rfind ищет только во второй половине строки)
+    if not response.endswith("."):
+        last_dot = response.rfind(".", len(response) // 2 + 1)
+        if last_dot != -1:
+            logger.debug("обрезка ответа на последней точке (поз %s)", last_dot)
+            response = response[: last_dot + 1]
 
     if not response or len(response) < 10:
         logger.warning("ответ слишком короткий после очистки")
-        return "Извини, я не смог сгенерировать подходящий ответ. Попробуйте переформулировать вопрос."
+        return FALLBACK_RESPONSE
 
     return response
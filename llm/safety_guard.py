@@ -157,6 +157,106 @@ SPAM_PATTERNS = [
 ]
 
 
+def _compile_union(patterns: list[str]) -> re.Pattern:
+    """
+    объединяет список паттернов в одно регулярное выражение с именованными группами,
+    чтобы проверять текст за один проход вместо цикла по всем паттернам
+
+    Args:
+        patterns: список паттернов
+
+    Returns:
+        скомпилированное выражение; имя сработавшей группы p<i> - индекс паттерна
+    """
+    return re.compile("|".join(f"(?P<p{i}>{p})" for i, p in enumerate(patterns)))
+
+
+def _matched(regex: re.Pattern, patterns: list[str], text: str) -> str | None:
+    """
+    проверка текста объединённым выражением; сработавшим считается первый
+    по порядку списка паттерн, как при проверке паттернов по одному
+    (объединённое выражение находит самое левое совпадение в тексте, и в логах
+    могло бы оказаться другое правило для того же текста)
+
+    Args:
+        regex: выражение, собранное через _compile_union
+        patterns: исходный список паттернов
+        text: текст для проверки
+
+    Returns:
+        сработавший паттерн или None
+    """
+    match = regex.search(text)
+    if match is None:
+        return None
+    # нарушения редки, поэтому повторная проверка по одному паттерну
+    # (только до сработавшего) не влияет на скорость обычных сообщений
+    found = int(match.lastgroup[1:])
+    return next(
+        (pattern for pattern in patterns[:found] if re.search(pattern, text)),
+        patterns[found],
+    )
+
+
+def _trie_pattern(words: list[str]) -> str:
+    """
+    строит из списка строк регулярное выражение в виде префиксного дерева
+    (аналог автомата Ахо-Корасик для re): общие префиксы ("взрыв" у "взрывы"
+    и "взрывчатка") проверяются один раз, а не для каждой строки заново
+
+    Args:
+        words: список строк (не регулярных выражений)
+
+    Returns:
+        текст регулярного выражения; совпадение (group(0)) - найденная строка
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        is_end = "" in node
+        branches = [
+            re.escape(char) + build(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if is_end else group
+
+    return build(trie)
+
+
+# паттерны компилируются один раз при импорте модуля
+INJECTION_RE = _compile_union(INJECTION_PATTERNS)
+SYSTEM_PROMPT_RE = _compile_union(SYSTEM_PROMPT_PATTERNS)
+FORBIDDEN_TOPICS_RE = re.compile(_trie_pattern(FORBIDDEN_TOPICS))
+SPAM_RE = _compile_union(SPAM_PATTERNS)
+
+# все категории одним выражением: обычное (безопасное) сообщение проверяется
+# за один проход по тексту, а по категориям разбираем только найденное совпадение
+ANY_VIOLATION_RE = re.compile(
+    "|".join(
+        [
+            *INJECTION_PATTERNS,
+            *SYSTEM_PROMPT_PATTERNS,
+            FORBIDDEN_TOPICS_RE.pattern,
+            *SPAM_PATTERNS,
+        ]
+    )
+)
+
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_SPECIAL_TOKEN_RE = re.compile(r"<\|.*?\|>")
+
+
 class SafetyGuard:
     """класс для проверки безопасности текста
     Содержит несколько циклов с проверкой на различные темы
@@ -175,47 +275,49 @@ class SafetyGuard:
         """
         text = text.lower()
 
-        for pattern in INJECTION_PATTERNS:
-            if re.search(pattern, text):
-                logger.warning(f"обнаружена попытка prompt injection: {pattern}")
-                return SafetyCheckResult(
-                    is_safe=False,
-                    violation=SafetyViolation.PROMPT_INJECTION,
-                    reason="Извини, но я не могу обработать этот запрос.",
-                    details={"pattern": pattern},
-                )
-
-        for pattern in SYSTEM_PROMPT_PATTERNS:
-            if re.search(pattern, text):
-                logger.warning(
-                    f"Ообнаружена попытка получить системный промпт: {pattern}"
-                )
-                return SafetyCheckResult(
-                    is_safe=False,
-                    violation=SafetyViolation.SYSTEM_PROMPT_LEAK,
-                    reason="Извини, но я не могу раскрыть эту информацию.",
-                    details={"pattern": pattern},
-                )
-
-        for topic in FORBIDDEN_TOPICS:
-            if topic in text:
-                logger.warning(f"обнаружена запретная тема: {topic}")
-                return SafetyCheckResult(
-                    is_safe=False,
-                    violation=SafetyViolation.FORBIDDEN_TOPIC,
-                    reason="Извини, но я не могу обсуждать эту тему.",
-                    details={"topic": topic},
-                )
-
-        for pattern in SPAM_PATTERNS:
-            if re.search(pattern, text):
-                logger.warning(f"обнаружен спам: {pattern}")
-                return SafetyCheckResult(
-                    is_safe=False,
-                    violation=SafetyViolation.SPAM,
-                    reason="Извини, но я не могу обработать этот запрос.",
-                    details={"pattern": pattern},
-                )
+        if ANY_VIOLATION_RE.search(text) is None:
+            return SafetyCheckResult(is_safe=True)
+
+        pattern = _matched(INJECTION_RE, INJECTION_PATTERNS, text)
+        if pattern is not None:
+            logger.warning("обнаружена попытка prompt injection: %s", pattern)
+            return SafetyCheckResult(
+                is_safe=False,
+                violation=SafetyViolation.PROMPT_INJECTION,
+                reason="Извини, но я не могу обработать этот запрос.",
+                details={"pattern": pattern},
+            )
+
+        pattern = _matched(SYSTEM_PROMPT_RE, SYSTEM_PROMPT_PATTERNS, text)
+        if pattern is not None:
+            logger.warning("Ообнаружена попытка получить системный промпт: %s", pattern)
+            return SafetyCheckResult(
+                is_safe=False,
+                violation=SafetyViolation.SYSTEM_PROMPT_LEAK,
+                reason="Извини, но я не могу раскрыть эту информацию.",
+                details={"pattern": pattern},
+            )
+
+        if FORBIDDEN_TOPICS_RE.search(text) is not None:
+            # первая по порядку списка тема, а не самая левая в тексте
+            topic = next(topic for topic in FORBIDDEN_TOPICS if topic in text)
+            logger.warning("обнаружена запретная тема: %s", topic)
+            return SafetyCheckResult(
+                is_safe=False,
+                violation=SafetyViolation.FORBIDDEN_TOPIC,
+                reason="Извини, но я не могу обсуждать эту тему.",
+                details={"topic": topic},
+            )
+
+        pattern = _matched(SPAM_RE, SPAM_PATTERNS, text)
+        if pattern is not None:
+            logger.warning("обнаружен спам: %s", pattern)
+            return SafetyCheckResult(
+                is_safe=False,
+                violation=SafetyViolation.SPAM,
+                reason="Извини, но я не могу обработать этот запрос.",
+                details={"pattern": pattern},
+            )
 
         return SafetyCheckResult(is_safe=True)
 
@@ -234,13 +336,15 @@ class SafetyGuard:
         Returns:
             очищенный текст
         """
-        text = re.sub(r"<[^>]+>", "", text)
-
-        text = re.sub(r"<\|.*?\|>", "", text)
+        # теги и спецтокены начинаются с "<": в обычном сообщении их нет,
+        # и оба прохода регулярками пропускаются
+        if "<" in text:
+            text = _HTML_TAG_RE.sub("", text)
 
-        text = re.sub(r"\s+", " ", text)
+            text = _SPECIAL_TOKEN_RE.sub("", text)
 
-        return text.strip()
+        # split/join по пробельным символам работает в C и заодно обрезает края
+        return " ".join(text.split())
 
 
 safety_guard = SafetyGuard()
@@ -0,0 +1,142 @@
+"""
+модуль семантического кэша ответов LLM
+похожие по смыслу вопросы ("что такое производная" / "объясни производную")
+получают уже сгенерированный ответ без обращения к модели
+"""
+
+import asyncio
+import logging
+import threading
+
+from llm.settings import get_config
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """
+    кэш ответов по эмбеддингам вопросов (косинусная близость)
+
+    эмбеддинги хранятся в заранее выделенной матрице (кольцевой буфер),
+    поиск - одно матрично-векторное умножение
+    включается через LLM_SEMANTIC_CACHE_MODEL, sentence-transformers и numpy
+    импортируются только при включенном кэше
+    """
+
+    def __init__(self, capacity: int = 1024):
+        """
+        инициализация кэша
+
+        Args:
+            capacity: максимальное количество сохранённых ответов
+        """
+        self.capacity = capacity
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._embeddings = None
+        self._answers: list[str] = []
+        self._next = 0
+        self._unavailable = False
+
+    @property
+    def config(self):
+        """
+        конфигурация LLM (get_config загружает её один раз за процесс)
+
+        Returns:
+            Mapping: словарь с конфигурацией LLM
+        """
+        return get_config()
+
+    @property
+    def enabled(self) -> bool:
+        """
+        включен ли семантический кэш
+
+        Returns:
+            bool: True, если задана модель эмбеддингов и её удалось загрузить
+        """
+        return not self._unavailable and bool(self.config["semantic_cache_model"])
+
+    def _encode(self, text: str):
+        """
+        эмбеддинг текста (модель загружается при первом вызове)
+
+        Args:
+            text: текст вопроса
+
+        Returns:
+            np.ndarray: нормированный вектор float32
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    model_name = self.config["semantic_cache_model"]
+                    logger.info("загрузка модели семантического кэша %s", model_name)
+                    self._model = SentenceTransformer(model_name, device="cpu")
+        return self._model.encode(
+            text, normalize_embeddings=True, convert_to_numpy=True
+        ).astype("float32")
+
+    async def lookup(self, text: str):
+        """
+        поиск ответа на похожий вопрос
+
+        Args:
+            text: очищенный текст вопроса
+
+        Returns:
+            tuple: (ответ или None, эмбеддинг вопроса для последующего add)
+        """
+        # кодирование занимает десятки мс CPU - выполняем вне цикла событий
+        try:
+            vector = await asyncio.to_thread(self._encode, text)
+        except ImportError:
+            logger.error(
+                "для семантического кэша нужны пакеты sentence-transformers и numpy, "
+                "кэш выключен"
+            )
+            self._unavailable = True
+            return None, None
+        except Exception:
+            # кэш необязателен: ошибка загрузки модели или кодирования
+            # не должна мешать генерации ответа
+            logger.exception("ошибка семантического кэша, кэш выключен")
+            self._unavailable = True
+            return None, None
+        if not self._answers:
+            return None, vector
+
+        sims = self._embeddings[: len(self._answers)] @ vector
+        best = int(sims.argmax())
+        if sims[best] >= self.config["semantic_cache_threshold"]:
+            logger.info("попадание в семантический кэш (близость %.3f)", sims[best])
+            return self._answers[best], vector
+        return None, vector
+
+    def add(self, vector, answer: str) -> None:
+        """
+        сохранение ответа в кэш (самая старая запись вытесняется при переполнении)
+
+        Args:
+            vector: эмбеддинг вопроса из lookup
+            answer: ответ модели
+        """
+        if self._embeddings is None:
+            import numpy as np
+
+            self._embeddings = np.zeros(
+                (self.capacity, vector.shape[0]), dtype=np.float32
+            )
+
+        self._embeddings[self._next] = vector
+        if len(self._answers) < self.capacity:
+            self._answers.append(answer)
+        else:
+            self._answers[self._next] = answer
+        self._next = (self._next + 1) % self.capacity
+
+
+semantic_cache = SemanticCache()
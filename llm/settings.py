@@ -2,15 +2,20 @@
 МПодуль для настройки гиперпараметров ллмки
 """
 
+from functools import lru_cache
+from types import MappingProxyType
+
 from config.configurations import load_config
 
 
+@lru_cache(maxsize=1)
 def get_config():
     """
     получение конфигурации LLM из централизованного конфига
+    (собирается один раз за процесс; словарь только для чтения)
 
     Returns:
-        Dict: словарь с конфигурацией LLM
+        Mapping: словарь с конфигурацией LLM
     """
     config = load_config()
 
@@ -25,6 +30,13 @@ def get_config():
         "num_retries": config.llm.num_retries,
         "error_message": config.llm.error_message,
         "timeout_message": config.llm.timeout_message,
+        "semantic_cache_model": config.llm.semantic_cache_model,
+        "semantic_cache_threshold": config.llm.semantic_cache_threshold,
+        "quantization": config.llm.quantization,
+        "compile": config.llm.compile,
+        "backend": config.llm.backend,
+        "batch_size": config.llm.batch_size,
+        "sample": config.llm.sample,
     }
 
-    return llm_config
+    return MappingProxyType(llm_config)
@@ -1,89 +1,247 @@
 """
-модуль для обработки запросов к LLM в отдельном процессе
+модуль для обработки запросов к LLM в отдельном потоке
 отвечает за инициализацию модели, обработку запросов и генерацию ответов
 """
 
-import multiprocessing
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
+import atexit
+import concurrent.futures
+import copy
+import importlib.util
 import logging
 import asyncio
+import threading
 import time
 import json
 import os
+import queue
 from datetime import datetime
-import re
+from logging.handlers import QueueHandler, QueueListener
 
 from llm.settings import get_config
 from llm.prompt_builder import build_prompt, process_response
 
-logging.basicConfig(level=logging.INFO)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# максимум запросов, ожидающих своей очереди к модели
+PENDING_QUEUE_SIZE = 64
+# как часто обработчик получает частичный ответ при потоковой генерации
+# (каждое обновление - редактирование сообщения в Telegram, у которого есть лимиты)
+STREAM_INTERVAL_SECONDS = 1.0
+LOGS_DIR = "logs"
+
 
-def log_llm_interaction(prompt, response, duration, error=None):
+def _dumps(entry: dict) -> bytes:
     """
-    логирование взаимодействия с LLM
+    сериализация записи лога в строку JSONL (orjson, если установлен):
+    сразу байты с переводом строки, без промежуточной str
 
     Args:
-        prompt: запрос к модели
-        response: ответ модели
-        duration: время обработки в секундах
-        error: описание ошибки, если возникла
+        entry: запись лога
+
+    Returns:
+        bytes: строка JSON в UTF-8 с переводом строки в конце
     """
-    log_entry = {
-        "timestamp": datetime.now().isoformat(),
-        "prompt": prompt,
-        "response": response,
-        "duration": f"{duration:.2f}s",
-        "error": error,
-    }
+    if orjson is not None:
+        return orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(entry, ensure_ascii=False) + "\n").encode()
 
-    try:
-        os.makedirs("logs", exist_ok=True)
 
-        log_file = f"logs/llm_interactions_{datetime.now().strftime('%Y%m%d')}.jsonl"
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+class DailyFileHandler(logging.FileHandler):
+    """
+    обработчик JSONL-логов, пишущий в отдельный файл на каждый день:
+    <prefix>_ГГГГММДД.jsonl. Сообщение записи - словарь, он сериализуется
+    здесь (в потоке QueueListener) и пишется в файл одним буфером
+    """
 
-    except Exception as e:
-        logger.error(f"ошибка записи лога взаимодействия с LLM: {e}")
+    def __init__(self, prefix: str):
+        """
+        Args:
+            prefix: начало имени файла лога
+        """
+        self.prefix = prefix
+        self.day = datetime.now().strftime("%Y%m%d")
+        super().__init__(self._filename(), mode="ab", delay=True)
+
+    def _filename(self) -> str:
+        return os.path.join(LOGS_DIR, f"{self.prefix}_{self.day}.jsonl")
+
+    def emit(self, record):
+        try:
+            day = datetime.now().strftime("%Y%m%d")
+            if day != self.day:
+                # наступил новый день - следующая запись откроет новый файл
+                self.day = day
+                if self.stream is not None:
+                    self.stream.close()
+                    self.stream = None
+                self.baseFilename = os.path.abspath(self._filename())
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(_dumps(record.msg))
+            self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+
+class _EntryQueueHandler(QueueHandler):
+    """
+    QueueHandler, передающий запись в очередь как есть: словарь в record.msg
+    сериализует DailyFileHandler, а не форматирование логгера
+    """
+
+    def prepare(self, record):
+        return record
 
 
-def log_raw_response(prompt, raw_response, cleaned_response):
+# JSONL-логи пишутся в файлы фоновым потоком (QueueListener): генерация
+# только кладёт запись в очередь
+_jsonl_loggers: dict[str, logging.Logger] = {}
+_jsonl_listeners: list[QueueListener] = []
+
+
+def _jsonl_logger(prefix: str) -> logging.Logger:
+    """
+    логгер JSONL-файла (создаётся при первом обращении)
+
+    Args:
+        prefix: начало имени файла лога
+
+    Returns:
+        logging.Logger: логгер, пишущий записи (словари) в файл через очередь
+    """
+    jsonl_logger = _jsonl_loggers.get(prefix)
+    if jsonl_logger is None:
+        os.makedirs(LOGS_DIR, exist_ok=True)
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, DailyFileHandler(prefix))
+        listener.start()
+        _jsonl_listeners.append(listener)
+
+        jsonl_logger = logging.getLogger(f"{__name__}.{prefix}")
+        jsonl_logger.handlers = [_EntryQueueHandler(log_queue)]
+        jsonl_logger.setLevel(logging.INFO)
+        jsonl_logger.propagate = False
+        _jsonl_loggers[prefix] = jsonl_logger
+    return jsonl_logger
+
+
+def flush_logs():
+    """
+    дописывает накопленные в очередях JSONL-логи и останавливает потоки записи
+    """
+    for listener in _jsonl_listeners:
+        listener.stop()
+    _jsonl_loggers.clear()
+    _jsonl_listeners.clear()
+
+
+atexit.register(flush_logs)
+
+
+def log_event(prompt, raw_response, response, duration, error=None):
     """
-    логирование сырого ответа модели (создаю здесь директорию, мне это было важно
-    для отладки)
+    логирование запроса к LLM одной строкой: запрос, сырой и очищенный ответ
 
     Args:
         prompt: запрос к модели
-        raw_response: необработанный ответ модели
-        cleaned_response: обработанный ответ модели
+        raw_response: необработанный ответ модели (None, если генерации не было)
+        response: ответ пользователю
+        duration: время обработки в секундах
+        error: описание ошибки, если возникла
     """
     log_entry = {
         "timestamp": datetime.now().isoformat(),
         "prompt": prompt,
         "raw_response": raw_response,
-        "cleaned_response": cleaned_response,
+        "response": response,
+        "duration": f"{duration:.2f}s",
+        "error": error,
     }
 
     try:
-        os.makedirs("logs", exist_ok=True)
+        _jsonl_logger("llm_interactions").info(log_entry)
+    except Exception as e:
+        logger.error("ошибка записи лога взаимодействия с LLM: %s", e)
 
-        log_file = f"logs/llm_raw_responses_{datetime.now().strftime('%Y%m%d')}.jsonl"
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
 
-    except Exception as e:
-        logger.error(f"ошибка записи лога ответа модели: {e}")
+class PartialAnswerStreamer:
+    """
+    стример для generate: накапливает сгенерированные токены и не чаще раза
+    в STREAM_INTERVAL_SECONDS передаёт текущий текст ответа в цикл событий
+    (generate вызывает put и end в потоке генерации)
+    после отмены запроса (таймаут) частичные ответы больше не отправляются
+    """
+
+    def __init__(
+        self,
+        decode,
+        loop: asyncio.AbstractEventLoop,
+        on_partial,
+        cancelled: threading.Event,
+    ):
+        """
+        Args:
+            decode: функция, превращающая список токенов в текст
+            loop: цикл событий, в котором выполняется on_partial
+            on_partial: корутина-функция, получающая текст ответа на данный момент
+            cancelled: флаг отмены запроса
+        """
+        self.decode = decode
+        self.loop = loop
+        self.on_partial = on_partial
+        self.cancelled = cancelled
+        self.token_ids: list[int] = []
+        self._prompt_skipped = False
+        self._last_sent = time.monotonic()
+        self._sending = None
+
+    def put(self, value):
+        # первым вызовом generate передаёт токены запроса - они не нужны
+        if not self._prompt_skipped:
+            self._prompt_skipped = True
+            return
+        self.token_ids.extend(value.reshape(-1).tolist())
+        if time.monotonic() - self._last_sent >= STREAM_INTERVAL_SECONDS:
+            self._send()
+
+    def _send(self):
+        # запрос отменён: обработчик уже показал сообщение о таймауте
+        if self.cancelled.is_set():
+            return
+        # предыдущее обновление ещё отправляется - пропускаю это
+        if self._sending is not None and not self._sending.done():
+            return
+        text = self.decode(self.token_ids).strip()
+        if not text:
+            return
+        self._last_sent = time.monotonic()
+        self._sending = asyncio.run_coroutine_threadsafe(
+            self.on_partial(text), self.loop
+        )
+
+    def end(self):
+        # итоговый ответ отправляет обработчик: дожидаюсь последнего обновления,
+        # чтобы оно не пришло позже и не перезаписало ответ
+        # (может вызываться повторно: после generate и при ошибке генерации)
+        sending, self._sending = self._sending, None
+        if sending is not None and not self.cancelled.is_set():
+            try:
+                sending.result(timeout=STREAM_INTERVAL_SECONDS * 5)
+            except Exception as e:
+                logger.warning("ошибка отправки частичного ответа: %s", e)
 
 
 class LLMWorker:
     """
-    воркер для обработки запросов к LLM в отдельном процессе
+    воркер для обработки запросов к LLM
 
-    он обеспечисвет  загрузку модели, обработку запросов в отдельном процессе,
-    обработку ошибок и асинхронную генерацию ответов
+    он обеспечисвет  загрузку модели, обработку запросов в отдельном потоке
+    (цикл событий бота не блокируется), обработку ошибок и асинхронную генерацию ответов
     """
 
     def __init__(self):
@@ -92,11 +250,42 @@ class LLMWorker:
         """
         self.model = None
         self.tokenizer = None
-        self.request_queue = multiprocessing.Queue()
-        self.response_queue = multiprocessing.Queue()
-        self.process = None
-        self.config = get_config()
+        # движок vLLM (LLM_BACKEND=vllm), используется вместо self.model
+        self.engine = None
+        # модель используется одним потоком за раз: генерация не начнётся,
+        # пока поток загрузки (start) не закончит инициализацию модели
+        self._model_lock = threading.Lock()
+        # постоянный поток генерации: не создаётся на каждый запрос и не занимает
+        # общий пул asyncio.to_thread (проверки безопасности, файлы); генерация,
+        # которую перестали ждать по таймауту, доработает до начала следующей
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="llm-generate"
+        )
+        self._loader: threading.Thread | None = None
+        self._init_attempted = False
+        # устройство инференса (может смениться на cpu, если CUDA недоступна)
+        self.device = None
         self.model_initialized = False
+        # KV-кэш системного промпта: системный промпт одинаков для всех запросов,
+        # поэтому его префилл считается один раз (системный промпт -> (токены, кэш))
+        self._prefix_cache = {}
+        # статический KV-кэш для скомпилированной модели (см. _static_kv_cache)
+        self._static_cache = None
+        # очередь запросов: модель обрабатывает одну пачку запросов за раз,
+        # поэтому запросы ждут здесь, а единственный потребитель передаёт их модели
+        self._pending: asyncio.Queue | None = None
+        self._consumer: asyncio.Task | None = None
+        self._busy = 0
+
+    @property
+    def config(self):
+        """
+        конфигурация LLM (get_config загружает её один раз за процесс)
+
+        Returns:
+            Mapping: словарь с конфигурацией LLM
+        """
+        return get_config()
 
     def init_model(self):
         """
@@ -105,32 +294,43 @@ class LLMWorker:
         Returns:
             bool: True если модель успешно инициализирована, False в случае ошибки
         """
-        if self.model is not None:
+        if self.model is not None or self.engine is not None:
             logger.info("модель уже инициализирована!")
             return True
 
+        if self.config["backend"] == "vllm":
+            return self._init_vllm()
+
+        # torch и transformers импортирую здесь: импорт модуля хэндлерами
+        # не должен тянуть тяжёлые библиотеки до загрузки модели
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self.device = self.config["device"]
+
         try:
             logger.info(
                 "инициализация модели %s на %s...",
                 self.config["model_name"],
-                self.config["device"],
+                self.device,
             )
 
             # проверяю доступность cuda
-            if (
-                self.config["device"].startswith("cuda")
-                and not torch.cuda.is_available()
-            ):
+            if self.device.startswith("cuda") and not torch.cuda.is_available():
                 logger.warning("CUDA запрошена, но недоступна. Переход на CPU.")
-                self.config["device"] = "cpu"
+                self.device = "cpu"
 
             if torch.cuda.is_available():
+                # TF32 на тензорных ядрах для оставшихся fp32-операций
+                torch.backends.cuda.matmul.allow_tf32 = True
+                torch.backends.cudnn.allow_tf32 = True
                 gpu_info = (
                     f"CUDA {torch.version.cuda}, GPU: {torch.cuda.get_device_name(0)}"
                 )
-                logger.info(f"CUDA доступна: {gpu_info}")
+                logger.info("CUDA доступна: %s", gpu_info)
                 logger.info(
-                    f"Память GPU: {torch.cuda.get_device_properties(0).total_memory / 1e9:.2f} GB"
+                    "Память GPU: %.2f GB",
+                    torch.cuda.get_device_properties(0).total_memory / 1e9,
                 )
             else:
                 logger.info("CUDA недоступна, переход на CPU")
@@ -141,14 +341,23 @@ class LLMWorker:
             )
 
             logger.info("загрузка модели...")
+            # веса грузятся сразу на устройство (device_map), без полной копии
+            # модели в памяти CPU; из safetensors - через mmap (transformers берёт
+            # safetensors, если они есть в чекпоинте)
             self.model = AutoModelForCausalLM.from_pretrained(
                 self.config["model_name"],
-                device_map=self.config["device"],
+                device_map=self.device,
+                low_cpu_mem_usage=True,
                 torch_dtype=torch.float16,
                 trust_remote_code=True,
+                quantization_config=self._quantization_config(),
+                attn_implementation=self._attn_implementation(),
             )
 
-            logger.info("модель успешно инициализирована на %s", self.config["device"])
+            if self.config["compile"]:
+                self._compile_model()
+
+            logger.info("модель успешно инициализирована на %s", self.device)
             self.model_initialized = True
             return True
 
@@ -157,175 +366,600 @@ class LLMWorker:
             self.model_initialized = False
             return False
 
-    def process_requests(self):
+    def _init_vllm(self):
         """
-        основной цикл обработки запросов с обработкой ошибок
+        инициализация движка vLLM вместо модели transformers
+
+        Returns:
+            bool: True если движок успешно инициализирован, False в случае ошибки
         """
-        model_ready = self.init_model()
+        try:
+            from vllm import LLM
 
-        while True:
-            try:
-                prompt = self.request_queue.get()
-                start_time = time.time()
-                logger.info("получен запрос на обработку")
-
-                if prompt == "STOP":
-                    break
-
-                if not model_ready:
-                    error_msg = "модель не инициализирована"
-                    logger.error(f"{error_msg}, возвращаем запасное сообщение")
-                    response = self.config["error_message"]
-                    log_llm_interaction(
-                        prompt, response, time.time() - start_time, error_msg
-                    )
-                    self.response_queue.put(f"FALLBACK: {response}")
-                    continue
-
-                chat_messages = build_prompt(prompt)
-                logger.info(f"созданы сообщения для чата: {chat_messages}")
-
-                text = self.tokenizer.apply_chat_template(
-                    chat_messages, tokenize=False, add_generation_prompt=True
-                )
+            self.device = self.config["device"]
+            logger.info("инициализация vLLM с моделью %s...", self.config["model_name"])
+            self.engine = LLM(
+                model=self.config["model_name"],
+                dtype="float16",
+                trust_remote_code=True,
+                # системный промпт общий для всех запросов: его KV-блоки
+                # переиспользуются между запросами, префилл считается один раз
+                enable_prefix_caching=True,
+            )
+            self.tokenizer = self.engine.get_tokenizer()
+            logger.info("vLLM успешно инициализирован")
+            self.model_initialized = True
+            return True
+
+        except Exception as e:
+            logger.error("ошибка инициализации vLLM: %s", str(e), exc_info=True)
+            self.model_initialized = False
+            return False
 
-                logger.info(f"обработка запроса: {text[:100]}...")
+    def _generate_vllm(self, texts):
+        """
+        генерация ответов движком vLLM
+
+        Args:
+            texts: запросы после применения шаблона чата
+
+        Returns:
+            list: пары (сырой ответ модели, количество сгенерированных токенов)
+        """
+        from vllm import SamplingParams
+
+        # temperature=0 в vLLM - жадное декодирование
+        sampling_params = SamplingParams(
+            max_tokens=self.config["max_new_tokens"],
+            temperature=self.config["temperature"] if self.config["sample"] else 0.0,
+            top_p=self.config["top_p"] if self.config["sample"] else 1.0,
+            repetition_penalty=self.config["repetition_penalty"],
+        )
+        completions = self.engine.generate(texts, sampling_params, use_tqdm=False)
+        return [
+            (completion.outputs[0].text.strip(), len(completion.outputs[0].token_ids))
+            for completion in completions
+        ]
+
+    def _compile_model(self):
+        """
+        компиляция forward модели через torch.compile и прогрев: компиляция
+        происходит на первом вызове, поэтому прогоняю короткую генерацию здесь,
+        а не на первом запросе пользователя
+        """
+        import torch
+
+        logger.info("компиляция модели...")
+        start_time = time.time()
+        # компилирую forward, а не саму модель: generate вызывается у исходного модуля
+        # и обёртка torch.compile(model) до него бы не дошла
+        self.model.forward = torch.compile(
+            self.model.forward, mode="reduce-overhead", fullgraph=False
+        )
+        text = self.tokenizer.apply_chat_template(
+            build_prompt("Привет"), tokenize=False, add_generation_prompt=True
+        )
+        tokens = self.tokenizer(text, return_tensors="pt").to(self.device)
+        # прогрев на статическом кэше того размера, что понадобится запросам
+        static_cache = self._static_kv_cache(
+            tokens.input_ids.shape[1] + self.config["max_new_tokens"]
+        )
+        with torch.no_grad():
+            self.model.generate(
+                **tokens,
+                past_key_values=static_cache,
+                max_new_tokens=4,
+                do_sample=False,
+            )
+        logger.info("модель скомпилирована за %.2f секунд", time.time() - start_time)
+
+    def _attn_implementation(self) -> str:
+        """
+        реализация внимания: FlashAttention-2 на GPU, если установлен пакет flash-attn,
+        иначе SDPA (scaled_dot_product_attention из torch)
+
+        Returns:
+            str: значение attn_implementation для from_pretrained
+        """
+        if self.device.startswith("cuda") and importlib.util.find_spec("flash_attn"):
+            return "flash_attention_2"
+        return "sdpa"
+
+    def _quantization_config(self):
+        """
+        конфигурация квантизации весов (LLM_QUANTIZATION): nf4 - 4 бита, int8 - 8 бит;
+        нужен пакет bitsandbytes и GPU, на CPU модель грузится в fp16 без квантизации
+
+        Returns:
+            BitsAndBytesConfig | None: конфигурация или None (без квантизации)
+        """
+        quantization = self.config["quantization"]
+        if not quantization:
+            return None
+        if not self.device.startswith("cuda"):
+            logger.warning(
+                "квантизация %s поддерживается только на GPU, загружаю fp16",
+                quantization,
+            )
+            return None
+
+        import torch
+        from transformers import BitsAndBytesConfig
+
+        if quantization == "nf4":
+            return BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_quant_type="nf4",
+                bnb_4bit_compute_dtype=torch.float16,
+                bnb_4bit_use_double_quant=True,
+            )
+        if quantization == "int8":
+            return BitsAndBytesConfig(load_in_8bit=True)
+        logger.warning("неизвестная квантизация %s, загружаю fp16", quantization)
+        return None
 
-                logger.info("токенизация ввода...")
-                tokens = self.tokenizer(text, return_tensors="pt").to(
-                    self.config["device"]
+    def get_prefix_cache(self, system_prompt: str):
+        """
+        токены и KV-кэш префикса чата с системным промптом (считаются один раз)
+
+        Args:
+            system_prompt: системный промпт
+
+        Returns:
+            tuple: (тензор токенов префикса, past_key_values префикса)
+        """
+        import torch
+
+        cached = self._prefix_cache.get(system_prompt)
+        if cached is None:
+            prefix_text = self.tokenizer.apply_chat_template(
+                [{"role": "system", "content": system_prompt}], tokenize=False
+            )
+            prefix_ids = self.tokenizer(prefix_text, return_tensors="pt").input_ids.to(
+                self.device
+            )
+            with torch.no_grad():
+                past_key_values = self.model(
+                    input_ids=prefix_ids, use_cache=True
+                ).past_key_values
+            cached = (prefix_ids, past_key_values)
+            self._prefix_cache[system_prompt] = cached
+            logger.info("KV-кэш системного промпта: %s токенов", prefix_ids.shape[1])
+        return cached
+
+    def _to_device(self, tokens):
+        """
+        перенос результата токенизации на устройство модели: на GPU - через
+        закреплённую (pinned) память и non_blocking, копирование идёт асинхронно
+        и не останавливает поток до запуска префилла
+
+        Args:
+            tokens: BatchEncoding токенизатора на CPU
+
+        Returns:
+            BatchEncoding: токены на устройстве модели
+        """
+        if not self.device.startswith("cuda"):
+            return tokens.to(self.device)
+
+        from transformers import BatchEncoding
+
+        return BatchEncoding(
+            {
+                key: value.pin_memory().to(self.device, non_blocking=True)
+                for key, value in tokens.items()
+            }
+        )
+
+    def _sampling_kwargs(self) -> dict:
+        """
+        параметры декодирования для generate: сэмплирование (LLM_SAMPLE) или жадное
+        декодирование - argmax без softmax и случайного выбора на каждом шаге,
+        одинаковый ответ на одинаковый вопрос
+
+        Returns:
+            dict: аргументы generate
+        """
+        if not self.config["sample"]:
+            return {
+                "do_sample": False,
+                "num_beams": 1,
+                "repetition_penalty": self.config["repetition_penalty"],
+            }
+        return {
+            "do_sample": True,
+            "temperature": self.config["temperature"],
+            "top_p": self.config["top_p"],
+            "repetition_penalty": self.config["repetition_penalty"],
+        }
+
+    def _static_kv_cache(self, needed: int, prefix_kv=None):
+        """
+        статический KV-кэш для скомпилированной модели (LLM_COMPILE): адреса и форма
+        тензоров кэша не меняются между запросами, поэтому CUDA graphs, записанные
+        torch.compile(mode="reduce-overhead"), переиспользуются, а не записываются
+        заново под каждую длину запроса. Размер - степень двойки, кэш пересоздаётся,
+        только если запрос в него не помещается
+
+        Args:
+            needed: длина запроса вместе с генерируемыми токенами
+            prefix_kv: KV-кэш системного промпта, который копируется в начало кэша
+
+        Returns:
+            StaticCache: подготовленный кэш
+        """
+        from transformers import StaticCache
+
+        if self._static_cache is None or self._static_cache.max_cache_len < needed:
+            size = 1 << (needed - 1).bit_length()
+            logger.info("статический KV-кэш на %s токенов", size)
+            self._static_cache = StaticCache(
+                config=self.model.config,
+                max_batch_size=1,
+                max_cache_len=size,
+                device=self.device,
+                dtype=self.model.dtype,
+            )
+
+        # копирование на месте: адреса тензоров кэша сохраняются
+        self._static_cache.reset()
+        if prefix_kv is not None:
+            for layer, (key, value) in enumerate(
+                zip(prefix_kv.key_cache, prefix_kv.value_cache)
+            ):
+                self._static_cache.key_cache[layer][:, :, : key.shape[2]].copy_(key)
+                self._static_cache.value_cache[layer][:, :, : value.shape[2]].copy_(
+                    value
                 )
+        return self._static_cache
+
+    def _load_model(self) -> bool:
+        """
+        однократная инициализация модели под блокировкой модели
+        (повторно после неудачи не загружаю: ошибка загрузки обычно не временная)
 
-                logger.info("генерация ответа...")
-                with torch.no_grad():
-                    output = self.model.generate(
-                        **tokens,
-                        max_new_tokens=self.config["max_new_tokens"],
-                        temperature=self.config["temperature"],
-                        top_p=self.config["top_p"],
-                        repetition_penalty=self.config["repetition_penalty"],
-                        do_sample=True,
-                    )
-
-                output_tokens = len(output[0]) - len(tokens.input_ids[0])
-
-                result = self.tokenizer.decode(output[0], skip_special_tokens=True)
-
-                input_text_len = len(result) - len(
-                    self.tokenizer.decode(
-                        output[0][len(tokens.input_ids[0]) :], skip_special_tokens=True
-                    )
+        Returns:
+            bool: True если модель инициализирована
+        """
+        with self._model_lock:
+            if not self._init_attempted:
+                self._init_attempted = True
+                self.init_model()
+            return self.model_initialized
+
+    def _process_batch(self, prompts, streamer=None, cancelled=None) -> list[str]:
+        """
+        обработка пачки запросов одним вызовом генерации (блокирующая, выполняется
+        в отдельном потоке)
+
+        Args:
+            prompts: запросы пользователя или сообщения для модели
+            streamer: стример частичного ответа (только для пачки из одного запроса)
+            cancelled: флаг отмены пачки (threading.Event) или None
+
+        Returns:
+            list[str]: ответы модели или сообщения об ошибке, по одному на запрос
+        """
+        start_time = time.time()
+        logger.info("получено запросов на обработку: %s", len(prompts))
+
+        if not self._load_model():
+            error_msg = "модель не инициализирована"
+            logger.error("%s, возвращаем запасное сообщение", error_msg)
+            response = self.config["error_message"]
+            for prompt in prompts:
+                log_event(prompt, None, response, time.time() - start_time, error_msg)
+            return [response] * len(prompts)
+
+        texts = []
+        try:
+            # обработчики присылают уже готовые сообщения (build_prompt_async),
+            # повторно оборачивать их в build_prompt нельзя
+            chats = [
+                prompt if isinstance(prompt, list) else build_prompt(prompt)
+                for prompt in prompts
+            ]
+            logger.info("созданы сообщения для чата: %s", chats)
+
+            texts = [
+                self.tokenizer.apply_chat_template(
+                    chat_messages, tokenize=False, add_generation_prompt=True
                 )
+                for chat_messages in chats
+            ]
+
+            logger.info("обработка запроса: %s...", texts[0][:100])
 
-                raw_answer = result[input_text_len:].strip()
+            with self._model_lock:
+                if self.engine is not None:
+                    logger.info("генерация ответа (vLLM)...")
+                    results = self._generate_vllm(texts)
+                elif len(texts) == 1:
+                    results = [self._generate(chats[0], texts[0], streamer, cancelled)]
+                else:
+                    results = self._generate_batch(texts, cancelled)
 
-                answer = process_response(raw_answer)
+        except Exception as e:
+            duration = time.time() - start_time
+            error_msg = str(e)
+            logger.error("ошибка обработки запроса: %s", error_msg, exc_info=True)
 
-                log_raw_response(text, raw_answer, answer)
+            response = self.config["error_message"]
+            for prompt in prompts:
+                log_event(prompt, None, response, duration, error_msg)
+            return [response] * len(prompts)
 
-                duration = time.time() - start_time
+        duration = time.time() - start_time
+        answers = []
+        for text, (raw_answer, output_tokens) in zip(texts, results):
+            answer = process_response(raw_answer)
 
-                logger.info(
-                    f"сгенерировано {output_tokens} токенов за {duration:.2f} секунд"
+            logger.info(
+                "сгенерировано %s токенов за %.2f секунд", output_tokens, duration
+            )
+            logger.info("ответ: %s...", answer[:100])
+
+            log_event(text, raw_answer, answer, duration)
+            answers.append(answer)
+        return answers
+
+    @staticmethod
+    def _stopping_criteria(cancelled):
+        """
+        критерий остановки generate по флагу отмены: запрос, ответ на который
+        уже не ждут (таймаут), не занимает поток генерации до max_new_tokens
+
+        Args:
+            cancelled: флаг отмены (threading.Event) или None
+
+        Returns:
+            StoppingCriteriaList | None: критерии для generate
+        """
+        if cancelled is None:
+            return None
+
+        import torch
+        from transformers import StoppingCriteria, StoppingCriteriaList
+
+        class Cancelled(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return torch.full(
+                    (input_ids.shape[0],),
+                    cancelled.is_set(),
+                    dtype=torch.bool,
+                    device=input_ids.device,
                 )
-                logger.info(f"ответ: {answer[:100]}...")
 
-                log_llm_interaction(text, answer, duration)
+        return StoppingCriteriaList([Cancelled()])
+
+    def _generate_batch(self, texts, cancelled=None):
+        """
+        генерация ответов на несколько запросов одним вызовом generate
+        (KV-кэш системного промпта здесь не используется: с левым паддингом
+        префиксы запросов в пачке не выровнены)
 
-                logger.info("отправка ответа в очередь")
-                self.response_queue.put(answer)
+        Args:
+            texts: запросы после применения шаблона чата
+            cancelled: флаг отмены пачки или None
 
-            except Exception as e:
-                duration = time.time() - start_time
-                error_msg = str(e)
-                logger.error(f"ошибка обработки запроса: {error_msg}", exc_info=True)
+        Returns:
+            list: пары (сырой ответ модели, количество сгенерированных токенов)
+        """
+        import torch
+
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        # левый паддинг: генерация продолжает последний токен каждой строки
+        self.tokenizer.padding_side = "left"
+
+        logger.info("токенизация пачки из %s запросов...", len(texts))
+        tokens = self._to_device(
+            self.tokenizer(texts, padding=True, return_tensors="pt")
+        )
+
+        logger.info("генерация ответов...")
+        with torch.no_grad():
+            output = self.model.generate(
+                **tokens,
+                max_new_tokens=self.config["max_new_tokens"],
+                **self._sampling_kwargs(),
+                pad_token_id=self.tokenizer.pad_token_id,
+                stopping_criteria=self._stopping_criteria(cancelled),
+            )
+
+        new_tokens = output[:, tokens.input_ids.shape[1] :]
+        answers = self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+        counts = (new_tokens != self.tokenizer.pad_token_id).sum(dim=1).tolist()
+        return [(answer.strip(), count) for answer, count in zip(answers, counts)]
 
-                response = self.config["error_message"]
-                log_llm_interaction(prompt, response, duration, error_msg)
-                self.response_queue.put(f"FALLBACK: {response}")
+    def _generate(self, chat_messages, text: str, streamer=None, cancelled=None):
+        """
+        генерация ответа моделью transformers
+
+        Args:
+            chat_messages: сообщения чата
+            text: сообщения после применения шаблона чата
+            streamer: стример частичного ответа или None
+            cancelled: флаг отмены запроса или None
+
+        Returns:
+            tuple: (сырой ответ модели, количество сгенерированных токенов)
+        """
+        import torch
+
+        logger.info("токенизация ввода...")
+        tokens = self._to_device(self.tokenizer(text, return_tensors="pt"))
+
+        # если запрос начинается с закэшированного префикса (системный промпт),
+        # модель не пересчитывает его: generate получает копию KV-кэша и подаёт
+        # в модель только токены после префикса (копию - т.к. generate дописывает
+        # в кэш токены текущего запроса)
+        generate_kwargs = {}
+        prefix_kv_cache = None
+        if chat_messages[0]["role"] == "system":
+            prefix_ids, prefix_kv = self.get_prefix_cache(chat_messages[0]["content"])
+            prefix_len = prefix_ids.shape[1]
+            if tokens.input_ids.shape[1] > prefix_len and torch.equal(
+                tokens.input_ids[0, :prefix_len], prefix_ids[0]
+            ):
+                prefix_kv_cache = prefix_kv
+
+        if self.config["compile"]:
+            needed = tokens.input_ids.shape[1] + self.config["max_new_tokens"]
+            generate_kwargs["past_key_values"] = self._static_kv_cache(
+                needed, prefix_kv_cache
+            )
+        elif prefix_kv_cache is not None:
+            generate_kwargs["past_key_values"] = copy.deepcopy(prefix_kv_cache)
+
+        logger.info("генерация ответа...")
+        try:
+            with torch.no_grad():
+                output = self.model.generate(
+                    **tokens,
+                    **generate_kwargs,
+                    max_new_tokens=self.config["max_new_tokens"],
+                    **self._sampling_kwargs(),
+                    streamer=streamer,
+                    stopping_criteria=self._stopping_criteria(cancelled),
+                )
+        finally:
+            # при ошибке generate не вызывает end: дожидаюсь отправки частичного
+            # ответа, чтобы он не пришёл позже итогового сообщения
+            if streamer is not None:
+                streamer.end()
+
+        # декодирую только сгенерированные токены, без запроса
+        new_tokens = output[0][tokens.input_ids.shape[1] :]
+        raw_answer = self.tokenizer.decode(new_tokens, skip_special_tokens=True).strip()
+
+        return raw_answer, len(new_tokens)
 
     def start(self):
         """
-        запуск воркера в отдельном процессе
+        запуск загрузки модели в фоновом потоке (бот продолжает запуск,
+        запросы дождутся окончания загрузки)
         """
-        if self.process is None:
-            logger.info("запуск процесса воркера LLM...")
-            self.process = multiprocessing.Process(target=self.process_requests)
-            self.process.start()
-            logger.info("процесс воркера LLM запущен")
+        if self._loader is None:
+            logger.info("запуск загрузки модели LLM...")
+            # daemon: поток не мешает завершению процесса бота
+            self._loader = threading.Thread(
+                target=self._load_model, name="llm-init", daemon=True
+            )
+            self._loader.start()
 
     def stop(self):
         """
-        остановка воркера
+        остановка воркера: ожидающие запросы больше не обрабатываются
+        """
+        if self._consumer is not None:
+            self._consumer.cancel()
+            self._consumer = None
+        # не жду выполняющуюся генерацию, ожидающие в пуле задачи отменяю
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("воркер LLM остановлен")
+
+    def pending_requests(self) -> int:
         """
-        if self.process is not None:
-            logger.info("остановка воркера LLM...")
-            self.request_queue.put("STOP")
-            self.process.join(timeout=5)
-            if self.process.is_alive():
-                logger.warning("принудительная остановка процесса воркера LLM")
-                self.process.terminate()
-                self.process.join(timeout=5)
-            logger.info("воркер LLM остановлен")
-            self.process = None
+        количество запросов, ожидающих обработки (включая выполняющийся)
 
-    async def generate_response(self, prompt):
+        Returns:
+            int: длина очереди запросов
+        """
+        if self._pending is None:
+            return 0
+        return self._pending.qsize() + self._busy
+
+    async def generate_response(self, prompt, on_partial=None):
         """
-        асинхронная генерация ответа на запрос
+        асинхронная генерация ответа на запрос: запрос ставится в очередь
+        и обрабатывается, когда до него дойдёт очередь
 
         Args:
             prompt: запрос пользователя или сообщения для модели
+            on_partial: корутина-функция для частичного ответа во время генерации
+                (вызывается не чаще раза в STREAM_INTERVAL_SECONDS; только если
+                запрос генерируется один, моделью transformers)
 
         Returns:
             str: ответ модели или сообщение об ошибке
         """
+        if self._pending is None:
+            self._pending = asyncio.Queue(maxsize=PENDING_QUEUE_SIZE)
+        if self._consumer is None or self._consumer.done():
+            self._consumer = asyncio.create_task(self._consume())
 
-        if self.process is None or not self.process.is_alive():
-            logger.warning("воркер LLM не запущен!запускаю...")
-            self.start()
-
-        start_time = time.time()
-        logger.info("отправка запроса в очередь запросов")
-        self.request_queue.put(prompt)
-
-        timeout = self.config["timeout_seconds"]
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._pending.put_nowait((prompt, future, on_partial))
+        except asyncio.QueueFull:
+            logger.warning("очередь запросов к LLM переполнена")
+            return self.config["error_message"]
+        return await future
 
+    async def _consume(self):
+        """
+        единственный потребитель очереди запросов: передаёт модели ожидающие
+        запросы пачкой (не больше batch_size), следующая пачка - после ответа
+        """
         while True:
+            batch = [await self._pending.get()]
+            while len(batch) < self.config["batch_size"] and not self._pending.empty():
+                batch.append(self._pending.get_nowait())
+            batch = [item for item in batch if not item[1].cancelled()]
+            if not batch:
+                continue
+
+            prompts = [prompt for prompt, _, _ in batch]
+            on_partial = batch[0][2] if len(batch) == 1 else None
+            # выставляется, когда ответ больше не ждут: поток генерации
+            # останавливается, частичные ответы не отправляются
+            cancelled = threading.Event()
+            streamer = None
+            if on_partial is not None and self.engine is None:
+                # токенизатор берётся при декодировании: модель может ещё загружаться
+                streamer = PartialAnswerStreamer(
+                    lambda token_ids: self.tokenizer.decode(
+                        token_ids, skip_special_tokens=True
+                    ),
+                    asyncio.get_running_loop(),
+                    on_partial,
+                    cancelled,
+                )
+            self._busy = len(batch)
+            start_time = time.time()
             try:
+                responses = await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(
+                        self._executor,
+                        self._process_batch,
+                        prompts,
+                        streamer,
+                        cancelled,
+                    ),
+                    self.config["timeout_seconds"],
+                )
+            except asyncio.TimeoutError:
                 elapsed = time.time() - start_time
-                if elapsed > timeout:
-                    error_msg = (
-                        f"генерация ответа превысила таймаут после {elapsed:.2f} секунд"
-                    )
-                    logger.warning(error_msg)
-                    log_llm_interaction(
-                        prompt, self.config["timeout_message"], elapsed, error_msg
-                    )
-                    return self.config["timeout_message"]
-
-                if not self.response_queue.empty():
-                    response = self.response_queue.get_nowait()
-                    logger.info("получен ответ из очереди")
-
-                    if response.startswith("FALLBACK:"):
-                        logger.warning("получен запасной ответ")
-                        return response[9:]
-
-                    logger.info("возвращаем обычный ответ")
-                    return response
-
-                await asyncio.sleep(0.1)
-
-            except Exception as e:
-                error_msg = str(e)
-                logger.error(f"ошибка получения ответа: {error_msg}", exc_info=True)
-                log_llm_interaction(
-                    prompt,
-                    self.config["error_message"],
-                    time.time() - start_time,
-                    error_msg,
+                error_msg = (
+                    f"генерация ответа превысила таймаут после {elapsed:.2f} секунд"
                 )
-                return self.config["error_message"]
+                logger.warning(error_msg)
+                response = self.config["timeout_message"]
+                for prompt in prompts:
+                    log_event(prompt, None, response, elapsed, error_msg)
+                responses = [response] * len(prompts)
+            except Exception as e:
+                logger.error("ошибка обработки запроса: %s", e, exc_info=True)
+                responses = [self.config["error_message"]] * len(prompts)
+            finally:
+                # после таймаута или отмены (stop) генерация в потоке ещё идёт
+                cancelled.set()
+                self._busy = 0
+
+            for (_, future, _), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
 
 
 llm_worker = LLMWorker()
@@ -5,6 +5,8 @@ import platform
 import shutil
 import venv
 
+TORCH_INDEX = "https://download.pytorch.org/whl/cu121"
+
 def is_venv():
     return (hasattr(sys, 'real_prefix') or 
             (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix))
@@ -45,7 +47,28 @@ def setup():
         return os.path.join(venv_dir, "Scripts", "python.exe")
     return os.path.join(venv_dir, "bin", "python")
 
+def install_with_uv(python):
+    uv = shutil.which("uv")
+    if not uv:
+        return False
+    
+    # uv качает пакеты параллельно и разрешает зависимости один раз на всё сразу
+    try:
+        subprocess.check_call([
+            uv, "pip", "install", "--python", python,
+            "-r", "requirements.txt",
+            "--extra-index-url", TORCH_INDEX,
+            "--index-strategy", "unsafe-best-match"
+        ])
+        return True
+    except Exception as e:
+        print(f"Ошибка uv: {e}, устанавливаю через pip")
+        return False
+
 def install_deps(python):
+    if install_with_uv(python):
+        return
+    
     try:
         subprocess.check_call([python, "-m", "pip", "install", "--upgrade", "pip"])
     except:
@@ -56,28 +79,29 @@ def install_deps(python):
             print(f"Ошибка pip: {e}")
             sys.exit(1)
     
+    # torch с CUDA и остальные зависимости - одним вызовом pip
     try:
         subprocess.check_call([
-            python, "-m", "pip", "install", 
-            "torch==2.5.1", "torchvision", "torchaudio", 
-            "--index-url", "https://download.pytorch.org/whl/cu121"
+            python, "-m", "pip", "install",
+            "-r", "requirements.txt",
+            "--extra-index-url", TORCH_INDEX
         ])
+        return
     except:
-        subprocess.check_call([
-            python, "-m", "pip", "install", 
-            "torch==2.5.1", "torchvision", "torchaudio"
-        ])
+        pass
     
+    # сборки torch с CUDA под эту платформу нет - ставим обычный torch
     with open("requirements.txt", "r") as f:
         reqs = [l for l in f.read().splitlines() if not l.startswith("torch")]
     
     with open("temp_reqs.txt", "w") as f:
-        f.write("\n".join(reqs))
+        f.write("\n".join(reqs + ["torch==2.5.1"]))
     
-    subprocess.check_call([python, "-m", "pip", "install", "-r", "temp_reqs.txt"])
-    
-    if os.path.exists("temp_reqs.txt"):
-        os.remove("temp_reqs.txt")
+    try:
+        subprocess.check_call([python, "-m", "pip", "install", "-r", "temp_reqs.txt"])
+    finally:
+        if os.path.exists("temp_reqs.txt"):
+            os.remove("temp_reqs.txt")
 
 def setup_db():
     db_paths = [
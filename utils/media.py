@@ -2,16 +2,22 @@
 модуль для работы с медиа-контентом
 """
 
+import asyncio
+import functools
 import os
 import logging
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import Message, FSInputFile
 
+from database.db_manager import get_db_manager
+
 logger = logging.getLogger(__name__)
 
 
 def check_file_exists(path: str) -> bool:
     """
-    проверяет существование файла и возможность его открытия
+    проверяет, что файл существует и доступен для чтения
+    (без открытия файла: ошибку чтения при отправке обработает send_menu_content)
 
     Args:
         path: путь к файлу
@@ -19,18 +25,100 @@ def check_file_exists(path: str) -> bool:
     Returns:
         bool: True если файл существует и доступен, иначе False
     """
-    if not path:
-        return False
+    return bool(path) and os.path.isfile(path) and os.access(path, os.R_OK)
+
+
+def _readable_file_mtime(path: str) -> float | None:
+    """
+    время изменения файла, если он существует и доступен для чтения
+
+    Args:
+        path: путь к файлу
 
+    Returns:
+        float | None: mtime файла или None, если файл недоступен
+    """
+    if not check_file_exists(path):
+        return None
     try:
-        if os.path.exists(path):
-            with open(path, "rb") as f:
-                # пробуем прочитать первый байт для проверки доступности
-                f.read(1)
-            return True
-    except Exception as e:
-        logger.error(f"ошибка проверки файла {path}: {e}")
-    return False
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+@functools.lru_cache(maxsize=128)
+def _cached_input_file(path: str, mtime: float) -> FSInputFile:
+    """
+    объект файла для отправки (один на файл, пока файл не изменился)
+
+    Args:
+        path: путь к файлу
+        mtime: время изменения файла (часть ключа кэша)
+
+    Returns:
+        FSInputFile: файл для отправки в Telegram
+    """
+    return FSInputFile(path)
+
+
+async def _file_mtime(path: str) -> float | None:
+    """
+    время изменения доступного файла: проверка и stat выполняются одним вызовом
+    в отдельном потоке, чтобы не блокировать цикл событий (при каждой отправке -
+    по mtime замечается замена файла)
+
+    Args:
+        path: путь к файлу
+
+    Returns:
+        float | None: mtime файла или None, если файл недоступен
+    """
+    if not path:
+        return None
+    return await asyncio.to_thread(_readable_file_mtime, path)
+
+
+async def _send_media(
+    message: Message, menu: dict, path: str, mtime: float, media_type: str
+) -> Message:
+    """
+    отправка изображения или видео: файл загружается в Telegram один раз,
+    дальше отправляется по сохранённому в БД file_id
+
+    Args:
+        message: сообщение для ответа
+        menu: словарь с данными меню
+        path: путь к файлу
+        mtime: время изменения файла
+        media_type: "photo" или "video"
+
+    Returns:
+        Message: отправленное сообщение
+    """
+    db = get_db_manager()
+    send = message.answer_photo if media_type == "photo" else message.answer_video
+    kwargs = {
+        "caption": menu["text"],
+        "reply_markup": menu["keyboard"],
+        "parse_mode": "HTML",
+    }
+
+    file_id = db.get_file_id(path, mtime)
+    if file_id is not None:
+        try:
+            return await send(file_id, **kwargs)
+        except TelegramBadRequest as e:
+            logger.warning("file_id файла %s недействителен: %s", path, e)
+            await db.forget_file_id(path)
+
+    sent = await send(_cached_input_file(path, mtime), **kwargs)
+    media = sent.photo[-1] if media_type == "photo" and sent.photo else sent.video
+    if media is not None:
+        try:
+            await db.save_file_id(path, mtime, media.file_id)
+        except Exception as e:
+            logger.error("ошибка сохранения file_id файла %s: %s", path, e)
+    return sent
 
 
 async def send_menu_content(message: Message, menu: dict) -> Message:
@@ -50,39 +138,38 @@ async def send_menu_content(message: Message, menu: dict) -> Message:
     video_path = menu.get("video")
 
     try:
-        if image_path and check_file_exists(image_path):
-            logger.info(f"отправка изображения: {image_path}")
+        image_mtime = await _file_mtime(image_path) if image_path else None
+        video_mtime = None
+        if image_mtime is None and video_path:
+            video_mtime = await _file_mtime(video_path)
+
+        if image_mtime is not None:
+            logger.info("отправка изображения: %s", image_path)
             try:
-                photo = FSInputFile(image_path)
-                return await message.answer_photo(
-                    photo=photo,
-                    caption=menu["text"],
-                    reply_markup=menu["keyboard"],
-                    parse_mode="HTML",
+                return await _send_media(
+                    message, menu, image_path, image_mtime, "photo"
                 )
             except Exception as e:
-                logger.error(f"ошибка при отправке изображения {image_path}: {e}")
+                logger.error("ошибка при отправке изображения %s: %s", image_path, e)
 
-        elif video_path and check_file_exists(video_path):
-            logger.info(f"отправка видео: {video_path}")
+        elif video_mtime is not None:
+            logger.info("отправка видео: %s", video_path)
             try:
-                video = FSInputFile(video_path)
-                return await message.answer_video(
-                    video=video,
-                    caption=menu["text"],
-                    reply_markup=menu["keyboard"],
-                    parse_mode="HTML",
+                return await _send_media(
+                    message, menu, video_path, video_mtime, "video"
                 )
             except Exception as e:
-                logger.error(f"ошибка при отправке видео {video_path}: {e}")
+                logger.error("ошибка при отправке видео %s: %s", video_path, e)
 
         # NOTICE если медиа отсутствует или не удалось отправить, то отправляем текст просто
         if image_path or video_path:
             logger.warning(
-                f"медиафайл не найдеН. изображение: {image_path}, видео: {video_path}"
+                "медиафайл не найдеН. изображение: %s, видео: %s",
+                image_path,
+                video_path,
             )
     except Exception as e:
-        logger.error(f"ошибка обработки медиа-контента: {e}")
+        logger.error("ошибка обработки медиа-контента: %s", e)
 
     logger.info("отправка текстового сообщения как запасной вариант")
     return await message.answer(